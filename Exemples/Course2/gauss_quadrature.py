@@ -0,0 +1,120 @@
+# Quadrature de Gauss-Legendre composite vectorisée
+#
+# Les points de Gauss de tout un paquet de sous-intervalles sont rangés dans un
+# seul tableau numpy (sous-intervalle, point de Gauss) : l'intégrande, qui doit
+# accepter un tableau, est évaluée en un appel, puis la réduction par les poids
+# est un unique produit scalaire. Les sous-intervalles sont traités par paquets
+# de chunkSize pour borner la mémoire.
+#
+# adaptive_integrate raffine au contraire les seuls sous-intervalles dont
+# l'erreur estimée (Gauss-Kronrod 7-15) est la plus grande.
+import heapq
+import numpy as np
+from numpy import polynomial
+
+# Schéma de Gauss-Kronrod à 15 points (QUADPACK, qk15) : abscisses positives de
+# Kronrod (les indices impairs sont les points de Gauss à 7 points) et poids
+xgk = np.array([0.991455371120812639206854697526329, 0.949107912342758524526189684047851,
+                0.864864423359769072789712788640926, 0.741531185599394439863864773280788,
+                0.586087235467691130294144845693013, 0.405845151377397166906606412076961,
+                0.207784955007898467600689403773245, 0.000000000000000000000000000000000])
+wgk = np.array([0.022935322010529224963732008058970, 0.063092092629978553290700663189204,
+                0.104790010322250183839876322541518, 0.140653259715525918745189590510238,
+                0.169004726639267902826583426598550, 0.190350578064785409913256402421014,
+                0.204432940075298892414161999234649, 0.209482141084727828012999174891714])
+wg  = np.array([0.129484966168869693270611432679082, 0.279705391489276667901467771423780,
+                0.381830050505118944950369775488975, 0.417959183673469387755102040816327])
+# Les 15 points dans [-1;1], et les poids de Kronrod et de Gauss correspondants
+kronrodPoints  = np.concatenate((-xgk[:-1], xgk[::-1]))
+kronrodWeights = np.concatenate((wgk[:-1], wgk[::-1]))
+gaussWeights   = np.zeros(15)
+gaussWeights[1:7:2], gaussWeights[7], gaussWeights[9:15:2] = wg[:3], wg[3], wg[2::-1]
+
+
+def leggauss(order : int) -> tuple:
+    """Points (dans [-1;1]) et poids du schéma de Gauss-Legendre d'ordre order."""
+    return polynomial.legendre.leggauss(order)
+
+
+def local_range(nbSubIntervals : int, nbp : int, rank : int) -> tuple:
+    """Premier sous-intervalle et nombre de sous-intervalles du processus rank (répartition par blocs).
+
+    Les nbSubIntervals%nbp premiers processus ont un sous-intervalle de plus.
+    """
+    nbSubLoc : int = nbSubIntervals//nbp
+    reste    : int = nbSubIntervals%nbp
+    begSub   : int = rank*nbSubLoc + min(rank, reste)
+    if rank < reste:
+        nbSubLoc += 1
+    return begSub, nbSubLoc
+
+
+def gauss_legendre_sum(f, a : float, h : float, begSub : int, nbSub : int, order : int = 64,
+                       chunkSize : int = 1024, quadrature : tuple | None = None) -> float:
+    """Somme des intégrales de f sur les sous-intervalles begSub, ..., begSub+nbSub-1 de [a + h*s, a + h*(s+1)].
+
+    f est une fonction vectorisée (tableau numpy -> tableau numpy de même forme).
+    """
+    points, weights = leggauss(order) if quadrature is None else quadrature
+    sum : float = 0.
+    for start in range(begSub, begSub+nbSub, chunkSize):
+        s  = np.arange(start, min(start+chunkSize, begSub+nbSub))
+        ai = a + h*s
+        mi = 0.5*(ai + (ai+h))
+        # Tableau (sous-intervalle, point de Gauss) des points d'intégration du paquet
+        gi = mi[:, np.newaxis] + 0.5*h*points[np.newaxis, :]
+        sum += 0.5*h*np.dot(f(gi).sum(axis=0), weights)
+    return sum
+
+
+def integrate(f, a : float, b : float, nbSubIntervals : int, order : int = 64, chunkSize : int = 1024) -> float:
+    """Intégrale de f sur [a;b] par la méthode de Gauss-Legendre composite à nbSubIntervals sous-intervalles."""
+    h : float = (b-a)/nbSubIntervals
+    return gauss_legendre_sum(f, a, h, 0, nbSubIntervals, order, chunkSize)
+
+
+def gauss_kronrod(f, ai : np.ndarray, bi : np.ndarray) -> tuple:
+    """Intégrales (Kronrod 15 points) de f sur les intervalles [ai;bi] et erreurs estimées |Kronrod - Gauss 7|."""
+    mi = 0.5*(ai+bi)
+    hi = 0.5*(bi-ai)
+    values = f(mi[:, np.newaxis] + hi[:, np.newaxis]*kronrodPoints[np.newaxis, :])
+    kronrod = hi*np.dot(values, kronrodWeights)
+    gauss   = hi*np.dot(values, gaussWeights)
+    return kronrod, np.abs(kronrod-gauss)
+
+
+def adaptive_integrate(f, a : float, b : float, tol : float = 1.E-10, rtol : float = 1.E-12,
+                       nbInitial : int = 64, batchSize : int = 64, maxIntervals : int = 100_000) -> tuple:
+    """Intégrale de f sur [a;b] par la méthode de Gauss-Kronrod adaptative.
+
+    On part de nbInitial sous-intervalles égaux (pour ne pas manquer une région
+    où f n'est pas nulle), rangés dans une file de priorité selon leur erreur
+    estimée. Tant que l'erreur totale dépasse max(tol, rtol*|intégrale|), les
+    batchSize sous-intervalles d'erreur la plus grande sont coupés en deux et
+    leurs moitiés évaluées en un seul appel vectorisé à f. Renvoie l'intégrale,
+    l'erreur estimée et le nombre d'évaluations de f.
+    """
+    edges = np.linspace(a, b, nbInitial+1)
+    integrals, errors = gauss_kronrod(f, edges[:-1], edges[1:])
+    nbEvaluations : int = 15*nbInitial
+    # File de priorité (-erreur, ai, bi, intégrale) : l'erreur la plus grande en tête
+    heap = [(-e, ai, bi, q) for e, ai, bi, q in zip(errors, edges[:-1], edges[1:], integrals)]
+    heapq.heapify(heap)
+    while len(heap) < maxIntervals:
+        total = sum(item[3] for item in heap)
+        error = sum(-item[0] for item in heap)
+        if error <= max(tol, rtol*abs(total)):
+            break
+        worst = [heapq.heappop(heap) for _ in range(min(batchSize, len(heap)))]
+        ai = np.array([item[1] for item in worst])
+        bi = np.array([item[2] for item in worst])
+        mi = 0.5*(ai+bi)
+        # Les deux moitiés de chaque intervalle, évaluées ensemble
+        left, right = np.concatenate((ai, mi)), np.concatenate((mi, bi))
+        integrals, errors = gauss_kronrod(f, left, right)
+        nbEvaluations += 15*left.size
+        for e, l, r, q in zip(errors, left, right, integrals):
+            heapq.heappush(heap, (-e, l, r, q))
+    total = sum(item[3] for item in heap)
+    error = sum(-item[0] for item in heap)
+    return total, error, nbEvaluations
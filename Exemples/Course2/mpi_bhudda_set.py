@@ -1,99 +1,305 @@
 # Calcul de l'ensemble de Mandelbrot en python
 import numpy as np
-from dataclasses import dataclass
+import os
+import sys
 from PIL import Image
-from math import pi
 from time import time
-import matplotlib.cm
 from mpi4py import MPI
 
-twoPi = 2.*pi
+from vectorized_bhudda_set import CompactHistogram, bin_orbits, escape_counts, mirror, sample_batch
 
-@dataclass
-class MandelbrotSet:
-    max_iterations: int
-    escape_radius : float = 2.0
+# Étiquettes des messages maître-esclave
+tagPack = 1
+tagDone = 2
+tagReduce = 3
 
-    def __contains__(self, c: complex) -> bool:
-        return self.stability(c) == 1
+# Les échantillons (tirés dans le demi-plan supérieur) sont groupés en blocs de
+# blockSize ; chaque bloc a son propre flux aléatoire, issu de la graine et de son
+# numéro, si bien que l'image ne dépend pas de la répartition des blocs entre processus
+blockSize = 256
 
-    def convergence(self, c:complex, clamp=True) -> float:
-        value = self.count_iterations(c)[0]/self.max_iterations
-        return max(0.0, min(value, 1.0)) if clamp else value
-
-    def count_iterations(self, c: complex) :
-        iter : int
-        z = []
-        z.append(c)
-        for iter in range(self.max_iterations):
-            z.append(z[-1]*z[-1] + c)
-            if abs(z[-1]) > self.escape_radius:
-                return iter, np.array(z[:-1],dtype=np.complex128)
-        return self.max_iterations,np.array([],dtype=np.complex128)
+def block_rng(seed : int, stream : int, block : int) -> np.random.Generator:
+    """Générateur indépendant du bloc block pour le flux stream (un flux par composante)."""
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(stream, block)))
 
 # Definition d'une tâche prenant un sous paquet de samples à traiter :
-def bhuddabort_task(nbSamples : int, maxIter : int, width : int, height : int ):
-    radius = 2*np.random.rand(nbSamples)
-    angle  = twoPi*np.random.rand(nbSamples)
-    scaleX = 0.25*width
-    scaleY = 0.25*height
-    image = np.zeros((width, height),dtype=np.int64)
-    cArr = radius*(np.cos(angle)+np.sin(angle)*1j)
-    mandelbrot_set = MandelbrotSet(max_iterations=maxIter)
-    for c in cArr:
-        niter, orbit = mandelbrot_set.count_iterations(c)
-        if niter < maxIter:
-            x = np.asarray(scaleX*(orbit.real+2.),dtype=np.int32)
-            y = np.asarray(scaleY*(orbit.imag+2.),dtype=np.int32)
-            mask = np.logical_and(x<width, y<height)
-            xfiltre = x[np.where(mask)]
-            yfiltre = y[np.where(mask)]
-            image[xfiltre,yfiltre] += 1
-    return image
+def bhuddabort_task(firstBlock : int, nbBlocks : int, maxIter : int, width : int, height : int,
+                    hist : CompactHistogram, seed : int, stream : int ):
+    """Ajoute à hist les orbites des points des blocs firstBlock, ..., firstBlock+nbBlocks-1."""
+    samples = [sample_batch(blockSize, rng=block_rng(seed, stream, block))
+               for block in range(firstBlock, firstBlock+nbBlocks)]
+    cr = np.concatenate([c[0] for c in samples])
+    ci = np.concatenate([c[1] for c in samples])
+    niter = escape_counts(cr, ci, maxIter)
+    escaping = niter < maxIter
+    bin_orbits(cr[escaping], ci[escaping], niter[escaping], np.zeros(np.count_nonzero(escaping)), hist, width, height)
 
-# Bhuddabrot to test the chronometer
-def bhuddabrot ( nbSamples : int, maxIter : int, width : int, height : int, comm : MPI.Comm ):
-    packSize = 64
-    nbp      = comm.size
-    rank     = comm.rank
+def next_pack_size(remaining : int, nbp : int, minPack : int, maxPack : int) -> int:
+    """Taille guidée : gros paquets au début, petits paquets à la fin pour équilibrer la charge."""
+    return min(remaining, max(minPack, min(maxPack, remaining//(2*nbp))))
 
-    nbPacks = (nbSamples+packSize-1)//packSize
-    image     = np.zeros((width, height),dtype=np.int64)
-    image_loc = np.zeros((width, height),dtype=np.int64)
+def distribute( firstBlock : int, endBlock : int, maxIter : int, width : int, height : int, hist : CompactHistogram,
+                comm : MPI.Comm, masterComputes : bool, minPack : int, maxPack : int, seed : int, stream : int ):
+    """Ajoute à l'histogramme local de chaque processus sa part des blocs firstBlock, ..., endBlock-1.
+
+    Un paquet est un couple (premier bloc, nombre de blocs), envoyé dans un tampon
+    numpy. Le maître envoie d'emblée deux paquets à chaque esclave, puis un
+    paquet par paquet terminé : chaque esclave a toujours son paquet suivant en
+    réserve (double tampon) et ne s'arrête jamais en attendant le maître. Un
+    paquet vide signale la fin. Avec masterComputes, le maître traite aussi de
+    petits paquets entre deux réponses aux esclaves.
+    """
+    nbp  = comm.size
+    rank = comm.rank
     # Algorithme maître-escalve :
     if rank==0: # Algorithme maître distribuant les tâches
+        nbWorkers = nbp-1
+        masterComputes = masterComputes or nbWorkers == 0
+        start : int = firstBlock
+        finished = set()
+        buffers  = []
+
+        def serve(dest : int):
+            # Envoi du paquet suivant (ou du paquet vide de fin) à l'esclave dest
+            nonlocal start
+            size = next_pack_size(endBlock-start, nbp, minPack, maxPack)
+            pack = np.array([start, size], dtype=np.int64)
+            buffers.append(comm.Isend([pack, MPI.INT64_T], dest=dest, tag=tagPack))
+            start += size
+            if size == 0:
+                finished.add(dest)
 
-        iPack : int = 0
         for iProc in range(1,nbp):
-            comm.send(iPack, iProc)
-            iPack += 1
+            serve(iProc)
+            serve(iProc)
+        done = np.zeros(1, dtype=np.int64)
         stat : MPI.Status = MPI.Status()
-        while iPack < nbPacks:
-            done = comm.recv(status=stat)# On reçoit du premier process à envoyer un message
-            slaveRk = stat.source
-            comm.send(iPack, dest=slaveRk)
-            iPack += 1
-        iPack = -1 # iPack vaut maintenant -1 pour signaler aux autres procs qu'il n'y a plus de tâches à exécuter
-        for iProc in range(1,nbp):
-            status = MPI.Status()
-            done = comm.recv(status=status)# On reçoit du premier process à envoyer un message
-            slaveRk : int = status.source
-            comm.send(iPack, dest=slaveRk)
-        comm.Reduce([image_loc,MPI.INT64_T], [image,MPI.INT64_T], op=MPI.SUM, root=0)
+        while len(finished) < nbWorkers or (masterComputes and start < endBlock):
+            if masterComputes and start < endBlock:
+                # On répond à tous les esclaves en attente avant de traiter un petit paquet
+                while comm.Iprobe(source=MPI.ANY_SOURCE, tag=tagDone, status=stat):
+                    comm.Recv([done, MPI.INT64_T], source=stat.source, tag=tagDone)
+                    serve(stat.source)
+                size = min(minPack, endBlock-start)
+                if size > 0:
+                    start += size
+                    bhuddabort_task(start-size, size, maxIter, width, height, hist, seed, stream)
+            else:
+                comm.Recv([done, MPI.INT64_T], source=MPI.ANY_SOURCE, tag=tagDone, status=stat)
+                serve(stat.source)
+        MPI.Request.Waitall(buffers)
     else:
-        status : MPI.Status = MPI.Status()
-        iPack : int
-        res   : int = 1
-
-        iPack = comm.recv(source=0) # On reçoit un n° de tâche à effectuer
-        while iPack != -1:          # Tant qu'il y a une tâche à faire
-            image_loc = bhuddabort_task(packSize, maxIter, width, height )
-            req : MPI.Request = comm.isend(res,0)
-            image += image_loc
-            iPack = comm.recv(source=0) # On reçoit un n° de tâche à effectuer
-            req.wait()
-        comm.Reduce([image,MPI.INT64_T], None, op=MPI.SUM, root=0)
-    return image
+        current = np.empty(2, dtype=np.int64)
+        pending = np.empty(2, dtype=np.int64)
+        done    = np.ones(1, dtype=np.int64)
+        comm.Recv([current, MPI.INT64_T], source=0, tag=tagPack) # On reçoit un paquet à effectuer
+        req : MPI.Request = comm.Irecv([pending, MPI.INT64_T], source=0, tag=tagPack) # ... et le suivant
+        while current[1] > 0:          # Tant qu'il y a une tâche à faire
+            bhuddabort_task(int(current[0]), int(current[1]), maxIter, width, height, hist, seed, stream)
+            req.Wait()
+            current, pending = pending, current
+            if current[1] > 0:
+                # Demande d'un nouveau paquet, reçu pendant le calcul de celui qu'on a déjà
+                comm.Send([done, MPI.INT64_T], dest=0, tag=tagDone)
+                req = comm.Irecv([pending, MPI.INT64_T], source=0, tag=tagPack)
+        req.Wait()
+
+def load_checkpoint( filename : str, maxIter : int, width : int, height : int, seed : int, stream : int ):
+    """Histogramme (non symétrisé) et numéro du prochain bloc d'une sauvegarde, (None, 0) si elle n'existe pas."""
+    if not os.path.exists(filename):
+        return None, 0
+    with np.load(filename) as data:
+        saved = (int(data["maxIter"]), int(data["seed"]), int(data["stream"]), int(data["blockSize"]))
+        if saved != (maxIter, seed, stream, blockSize) or data["image"].shape != (width, height):
+            raise ValueError(f"La sauvegarde {filename} correspond à d'autres paramètres de calcul")
+        return data["image"].copy(), int(data["nextBlock"])
+
+def save_checkpoint( filename : str, image : np.ndarray, nextBlock : int, maxIter : int, seed : int, stream : int ):
+    # Écriture dans un fichier temporaire puis renommage : une sauvegarde interrompue n'écrase pas la précédente
+    with open(filename + ".tmp", "wb") as f:
+        np.savez(f, image=image, nextBlock=nextBlock, maxIter=maxIter, seed=seed, stream=stream, blockSize=blockSize)
+    os.replace(filename + ".tmp", filename)
+
+# Codage d'un histogramme partiel dans un message de réduction (premier champ de l'entête)
+formatSparse, formatUInt32, formatInt64 = 0, 1, 2
+
+def tree_links( rank : int, nbp : int ) -> tuple:
+    """Fils de rank dans l'arbre binomial de racine 0 (dans l'ordre de réception) et son père (None pour 0)."""
+    children, step = [], 1
+    while step < nbp:
+        if rank % (2*step) == step:
+            return children, rank-step
+        if rank+step < nbp:
+            children.append(rank+step)
+        step *= 2
+    return children, None
+
+class TreeReduction:
+    """Réduction d'un histogramme local vers l'image (int64) du processus 0 par un arbre binomial.
+
+    Chaque nœud envoie à son père la somme de son histogramme et de ceux de ses
+    fils sous la forme la plus compacte, décrite par une entête (format, longueur) :
+    - liste creuse (indice int32, compte int64) si moins d'un tiers des pixels
+      sont non vides (12 octets par pixel non vide contre 4 par pixel en uint32) ;
+    - sinon tableau dense en uint32 si aucun compte ne déborde,
+    - et en int64 sinon.
+    Le format est choisi localement, sans communication collective préalable :
+    un processus entre dans la réduction dès qu'il a terminé ses paquets, et les
+    esclaves combinent leurs histogrammes pendant que les autres calculent encore.
+    Une feuille envoie le sien aussitôt (Isend) ; un nœud interne reçoit et
+    additionne ceux de ses fils dans wait(). Les messages sont des tampons numpy,
+    sans sérialisation (l'ordre des messages d'une même source est garanti).
+    """
+
+    def __init__(self, hist : CompactHistogram, image : np.ndarray, comm : MPI.Comm, sparse : bool):
+        self.comm   = comm
+        self.flat   = image.reshape(-1)
+        self.size   = hist.size
+        self.sparse = sparse
+        self.children, self.parent = tree_links(comm.rank, comm.size)
+        # Copie de l'histogramme local : hist est réutilisé pour la tranche suivante
+        self.index, self.values, self.dense = None, None, None
+        index = hist.nonzero() if sparse else None
+        if sparse and 3*index.size < self.size:
+            self.index, self.values = index.astype(np.int32), hist.values(index)
+        else:
+            self.dense = hist.counts.copy() if hist.spill is None else hist.total()
+        self.requests, self.buffers = [], []
+        if not self.children:
+            self.send()
+
+    def send(self):
+        # Envoi non bloquant de l'histogramme partiel au père ; les tampons sont conservés jusqu'à wait()
+        if self.parent is None:
+            return
+        if self.dense is None:
+            self.buffers = [[np.array([formatSparse, self.index.size], dtype=np.int64), MPI.INT64_T],
+                            [self.index, MPI.INT32_T], [self.values, MPI.INT64_T]]
+        else:
+            dense = self.dense
+            if dense.dtype != np.uint32 and dense.max(initial=0) <= np.iinfo(np.uint32).max:
+                dense = dense.astype(np.uint32)
+            if dense.dtype == np.uint32:
+                self.buffers = [[np.array([formatUInt32, dense.size], dtype=np.int64), MPI.INT64_T],
+                                [dense, MPI.UINT32_T]]
+            else:
+                self.buffers = [[np.array([formatInt64, dense.size], dtype=np.int64), MPI.INT64_T],
+                                [dense, MPI.INT64_T]]
+        self.requests = [self.comm.Isend(buffer, dest=self.parent, tag=tagReduce) for buffer in self.buffers]
+
+    def receive(self, source : int):
+        # Réception de l'histogramme partiel du fils source, ajouté à celui du nœud
+        header = np.empty(2, dtype=np.int64)
+        self.comm.Recv([header, MPI.INT64_T], source=source, tag=tagReduce)
+        kind, length = int(header[0]), int(header[1])
+        if kind == formatSparse:
+            index  = np.empty(length, dtype=np.int32)
+            values = np.empty(length, dtype=np.int64)
+            self.comm.Recv([index, MPI.INT32_T], source=source, tag=tagReduce)
+            self.comm.Recv([values, MPI.INT64_T], source=source, tag=tagReduce)
+            if self.dense is None:
+                self.index, inverse = np.unique(np.concatenate((self.index, index)), return_inverse=True)
+                summed = np.zeros(self.index.size, dtype=np.int64)
+                np.add.at(summed, inverse, np.concatenate((self.values, values)))
+                self.values = summed
+                if 3*self.index.size < self.size:
+                    return
+                index, values = self.index, self.values
+                self.index, self.values, self.dense = None, None, np.zeros(self.size, dtype=np.int64)
+            elif self.dense.dtype != np.int64:
+                self.dense = self.dense.astype(np.int64)
+            self.dense[index] += values
+            return
+        other = np.empty(length, dtype=np.uint32 if kind == formatUInt32 else np.int64)
+        self.comm.Recv([other, MPI.UINT32_T if kind == formatUInt32 else MPI.INT64_T], source=source, tag=tagReduce)
+        if self.dense is None:
+            self.dense = np.zeros(self.size, dtype=np.int64)
+            self.dense[self.index] = self.values
+            self.index, self.values = None, None
+        elif self.dense.dtype != np.int64:
+            self.dense = self.dense.astype(np.int64)
+        self.dense += other
+
+    def wait(self):
+        """Achève la réduction ; sur le processus 0, ajoute le résultat à l'image."""
+        if self.children:
+            for child in self.children:
+                self.receive(child)
+            self.send()
+        MPI.Request.Waitall(self.requests)
+        self.requests, self.buffers = [], []
+        if self.parent is None:
+            if self.dense is None:
+                self.flat[self.index] += self.values
+            else:
+                self.flat += self.dense
+
+# Bhuddabrot to test the chronometer
+def bhuddabrot ( nbSamples : int, maxIter : int, width : int, height : int, comm : MPI.Comm,
+                 masterComputes : bool = True, minPack : int = 256, maxPack : int = 16384,
+                 seed : int = 0, stream : int = 0, checkpoint : str | None = None, checkpointBlocks : int = 0,
+                 sparse : bool = True ):
+    """Histogramme de Bhuddabrot réparti en paquets de blocs de taille adaptative (algorithme maître-esclave).
+
+    nbSamples est arrondi à un nombre entier de blocs (2*blockSize échantillons,
+    la moitié étant obtenue par symétrie). Pour une même graine seed et un même
+    flux stream, le résultat ne dépend pas du nombre de processus. Avec
+    checkpoint, le calcul se fait par tranches de checkpointBlocks blocs (une
+    seule tranche si 0) ; après chaque tranche, les histogrammes sont réduits
+    sur le processus 0 et sauvegardés avec le numéro du prochain bloc. Un
+    nouvel appel reprend à ce bloc : on peut ainsi terminer un calcul
+    interrompu, ou l'étendre en augmentant nbSamples (ValueError si la
+    sauvegarde contient plus d'échantillons que demandé). L'image est symétrisée
+    sur le processus 0.
+
+    Chaque processus accumule dans un CompactHistogram (uint32). La réduction
+    (TreeReduction, sur une copie de l'histogramme) commence sur chaque
+    processus dès qu'il a reçu son paquet vide : les esclaves qui finissent tôt
+    combinent leurs histogrammes pendant les derniers paquets des autres. Avec
+    plusieurs tranches, les feuilles de l'arbre envoient de plus leur tranche
+    pendant le calcul de la suivante.
+    """
+    rank     = comm.rank
+    endBlock = (nbSamples + 2*blockSize-1)//(2*blockSize)
+    minBlocks, maxBlocks = max(1, minPack//blockSize), max(1, maxPack//blockSize)
+
+    image, nextBlock, error = None, 0, None
+    if checkpoint is not None and rank == 0:
+        try:
+            image, nextBlock = load_checkpoint(checkpoint, maxIter, width, height, seed, stream)
+        except ValueError as e:
+            error = str(e)
+    # Le message d'erreur éventuel est diffusé avec nextBlock : tous les processus lèvent l'erreur ensemble
+    nextBlock, error = comm.bcast((nextBlock, error), root=0)
+    if error is None and nextBlock > endBlock:
+        error = (f"La sauvegarde {checkpoint} contient déjà {2*blockSize*nextBlock} échantillons, "
+                 f"plus que les {nbSamples} demandés")
+    if error is not None:
+        raise ValueError(error)
+    if image is None:
+        image = np.zeros((width, height),dtype=np.int64)
+    roundBlocks = checkpointBlocks if checkpoint is not None and checkpointBlocks > 0 else max(endBlock-nextBlock, 1)
+    hist = CompactHistogram(width*height)
+    pending, reducedBlock = None, nextBlock
+
+    def finish():
+        # Fin de la réduction de la tranche précédente, puis sauvegarde
+        pending.wait()
+        if rank == 0 and checkpoint is not None:
+            save_checkpoint(checkpoint, image, reducedBlock, maxIter, seed, stream)
+
+    while nextBlock < endBlock:
+        roundEnd = min(nextBlock+roundBlocks, endBlock)
+        hist.clear()
+        distribute(nextBlock, roundEnd, maxIter, width, height, hist, comm, masterComputes, minBlocks, maxBlocks,
+                   seed, stream)
+        if pending is not None:
+            finish()
+        pending, reducedBlock = TreeReduction(hist, image, comm, sparse), roundEnd
+        nextBlock = roundEnd
+    if pending is not None:
+        finish()
+    return mirror(image) if rank == 0 else image
 
 globCom = MPI.COMM_WORLD.Dup()
 nbp     = globCom.size
@@ -105,6 +311,13 @@ out      = open(filename, mode='w')
 
 # On peut changer les paramètres des deux prochaines lignes
 width, height = 1024, 1024
+masterComputes = True # Le processus 0 traite aussi des paquets
+seed = 2025           # Même image quel que soit le nombre de processus
+# Avec l'option --checkpoint, sauvegarde (reprise, extension) tous les checkpointBlocks blocs
+# dans bhudda_<composante>.npz ; sans elle, tout est recalculé et le temps mesuré est significatif
+checkpointBlocks = 64
+useCheckpoint = "--checkpoint" in sys.argv[1:]
+checkpoints = [f"bhudda_{colour}.npz" if useCheckpoint else None for colour in ("red", "green", "blue")]
 
 # Calcul de chaque composante de Bhuddabrot
 s1 = 1500_000 #150_000
@@ -112,11 +325,14 @@ s2 =  500_000 # 50_000
 s3 =    30000 # 3_000
 deb = time()
 out.write("red\n")
-redOrbit   = bhuddabrot( s1,  2_000, width, height, globCom)
+redOrbit   = bhuddabrot( s1,  2_000, width, height, globCom, masterComputes,
+                         seed=seed, stream=0, checkpoint=checkpoints[0], checkpointBlocks=checkpointBlocks)
 out.write("green\n")
-greenOrbit = bhuddabrot(  s2, 10_000, width, height, globCom)
+greenOrbit = bhuddabrot(  s2, 10_000, width, height, globCom, masterComputes,
+                         seed=seed, stream=1, checkpoint=checkpoints[1], checkpointBlocks=checkpointBlocks)
 out.write("blue\n")
-blueOrbit  = bhuddabrot(   s3, 10_000, width, height, globCom)
+blueOrbit  = bhuddabrot(   s3, 10_000, width, height, globCom, masterComputes,
+                         seed=seed, stream=2, checkpoint=checkpoints[2], checkpointBlocks=checkpointBlocks)
 fin = time()
 out.write(f"Temps du calcul de l'ensemble de Bhuddabrot : {fin-deb} secondes\n")
 
@@ -130,10 +346,14 @@ if rank==0:
     scal1 : float = 16.*stride/b1
     scal2 : float = 16.*stride/b2
     scal3 : float = 16.*stride/b3
-    red   = np.array(np.clip((scal1*redOrbit).astype(np.uint8),0,255))
-    green = np.array(np.clip((scal2*greenOrbit).astype(np.uint8),0,255))
-    blue  = np.array(np.clip((scal3*blueOrbit).astype(np.uint8),0,255))
-    pixels = np.stack((red,green,blue),axis=-1)
+    # Mise à l'échelle de chaque canal dans un tampon float32 unique, écrit
+    # directement dans l'image uint8 préallouée (saturation à 255)
+    pixels  = np.empty((width, height, 3), dtype=np.uint8)
+    channel = np.empty((width, height), dtype=np.float32)
+    for k, (orbit, scal) in enumerate(((redOrbit, scal1), (greenOrbit, scal2), (blueOrbit, scal3))):
+        np.multiply(orbit, scal, out=channel, casting='unsafe')
+        np.clip(channel, 0, 255, out=channel)
+        pixels[:, :, k] = channel
     image = Image.fromarray(pixels, 'RGB')
     fin = time()
     out.write(f"Temps de constitution de l'image : {fin-deb} secondes\n")
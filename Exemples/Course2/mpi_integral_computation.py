@@ -1,11 +1,12 @@
 from mpi4py import MPI
-from math import sin, exp
-from numpy import polynomial
+import numpy as np
 import time
+from gauss_quadrature import gauss_legendre_sum, local_range
 order=64
 
-def f(x : float) -> float:
-    return abs(sin(x*x))*exp(-x*x)
+# Intégrande vectorisée : x est un tableau numpy
+def f(x : np.ndarray) -> np.ndarray:
+    return np.abs(np.sin(x*x))*np.exp(-x*x)
 
 a              : float = -100.
 b              : float = +100.
@@ -19,33 +20,11 @@ rank      = comGlobal.rank
 bufferFileName = f"output{rank:03d}.txt"
 out = open(bufferFileName, 'w')
 
-# Récupération du schéma de quadrature de Gauss-Legendre d'ordre order
-#  quadrature contient deux tableaux : 
-#     quadrature[0] contient les points d'intégration (dans [-1;1])
-#     quadrature[1] contient les poids d'intégration
-quadrature = polynomial.legendre.leggauss(order)
-
 debut = time.time()
-sumLoc   : float = 0.
-nbSubLoc : int   = nbSubIntervals//nbp
-reste    : int   = nbSubIntervals%nbp
-if reste > rank :
-    nbSubLoc += 1
-# Calcul du premier intervalle concerné par le processus :
-begSub : int = rank * nbSubLoc
-if reste < rank :
-    begSub += reste
-for s in range(begSub, begSub+nbSubLoc):
-    ai : float = a + h*s
-    bi : float = ai + h
-    mi : float = 0.5*(ai+bi)
-    si : float = 0.
-    # Gauss quadrature :
-    for iGauss in range(len(quadrature[0])):
-        gi : float = mi + 0.5*h*quadrature[0][iGauss]
-        si += quadrature[1][iGauss] * f(gi)
-    si = 0.5*h*si
-    sumLoc += si
+# Calcul du premier intervalle concerné par le processus et du nombre d'intervalles :
+begSub, nbSubLoc = local_range(nbSubIntervals, nbp, rank)
+# Quadrature de Gauss-Legendre vectorisée sur les sous-intervalles locaux
+sumLoc : float = gauss_legendre_sum(f, a, h, begSub, nbSubLoc, order)
 sum : float = comGlobal.reduce(sumLoc, MPI.SUM, 0)
 fin = time.time()
 if rank == 0:
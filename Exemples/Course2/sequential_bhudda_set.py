@@ -4,7 +4,6 @@ from dataclasses import dataclass
 from PIL import Image
 from math import pi
 from time import time
-import matplotlib.cm
 
 twoPi = 2.*pi
 
@@ -77,10 +76,14 @@ stride : int = width*height
 scal1 : float = 16.*stride/b1
 scal2 : float = 16.*stride/b2
 scal3 : float = 16.*stride/b3
-red   = np.array(np.clip((scal1*redOrbit).astype(np.uint8),0,255))
-green = np.array(np.clip((scal2*greenOrbit).astype(np.uint8),0,255))
-blue  = np.array(np.clip((scal3*blueOrbit).astype(np.uint8),0,255))
-pixels = np.stack((red,green,blue),axis=-1)
+# Mise à l'échelle de chaque canal dans un tampon float32 unique, écrit
+# directement dans l'image uint8 préallouée (saturation à 255)
+pixels  = np.empty((width, height, 3), dtype=np.uint8)
+channel = np.empty((width, height), dtype=np.float32)
+for k, (orbit, scal) in enumerate(((redOrbit, scal1), (greenOrbit, scal2), (blueOrbit, scal3))):
+    np.multiply(orbit, scal, out=channel, casting='unsafe')
+    np.clip(channel, 0, 255, out=channel)
+    pixels[:, :, k] = channel
 image = Image.fromarray(pixels, 'RGB')
 fin = time()
 print(f"Temps de constitution de l'image : {fin-deb}")
@@ -0,0 +1,397 @@
+# Calcul vectorisé de Bhuddabrot : les échantillons sont itérés par paquets
+# sous forme de tableaux numpy, et les pixels visités sont accumulés directement
+# dans l'histogramme par np.bincount sur des indices à plat.
+import numpy as np
+from PIL import Image
+import sys
+from math import pi
+from time import time
+
+twoPi = 2.*pi
+# Fenêtre (xmin, xmax, ymin, ymax) de l'image complète
+fullWindow = (-2., 2., -2., 2.)
+
+
+def draw_samples(nbSamples : int, upper : bool = False, rng = np.random) -> tuple:
+    """Tirage des points c dans le disque de rayon 2 (même loi que sequential_bhudda_set.py).
+
+    Avec upper, les points sont tirés dans le demi-disque Im(c) >= 0. rng est
+    le générateur utilisé (np.random.Generator ou, par défaut, le module np.random).
+    """
+    radius = 2*rng.random(nbSamples)
+    angle  = (pi if upper else twoPi)*rng.random(nbSamples)
+    return radius*np.cos(angle), radius*np.sin(angle)
+
+
+def in_main_components(cr : np.ndarray, ci : np.ndarray) -> np.ndarray:
+    """Vrai pour les points de la cardioïde principale ou du disque de période 2 (qui ne s'échappent jamais)."""
+    ci2 = ci*ci
+    q = (cr-0.25)**2 + ci2
+    return (q*(q + cr - 0.25) <= 0.25*ci2) | ((cr+1.)**2 + ci2 <= 0.0625)
+
+
+def sample_batch(nbSamples : int, reject : bool = True, symmetric : bool = True, rng = np.random) -> tuple:
+    """Tirage d'un paquet de points c.
+
+    Avec reject, les points de la cardioïde et du disque de période 2 sont
+    écartés avant toute itération : ils ne contribuent à aucun histogramme,
+    l'estimateur reste donc le même. Avec symmetric, les points sont tirés dans
+    le demi-plan supérieur ; l'histogramme doit ensuite être symétrisé (mirror).
+    """
+    cr, ci = draw_samples(nbSamples, upper=symmetric, rng=rng)
+    if reject:
+        keep = ~in_main_components(cr, ci)
+        cr, ci = cr[keep], ci[keep]
+    return cr, ci
+
+
+def mirror(image : np.ndarray) -> np.ndarray:
+    """Ajoute à image (..., width, height) sa symétrique par conjugaison (la ligne y devient height-1-y)."""
+    return image + image[..., ::-1]
+
+
+def pixel_index(zr : np.ndarray, zi : np.ndarray, width : int, height : int,
+                window : tuple = fullWindow) -> np.ndarray:
+    """Indice à plat x*height+y du pixel de chaque point, -1 hors de la fenêtre (xmin, xmax, ymin, ymax)."""
+    xmin, xmax, ymin, ymax = window
+    u = width/(xmax-xmin)*(zr-xmin)
+    v = height/(ymax-ymin)*(zi-ymin)
+    inside = (u >= 0) & (u < width) & (v >= 0) & (v < height)
+    return np.where(inside, u.astype(np.int32)*height + v.astype(np.int32), -1)
+
+
+def escape_counts(cr : np.ndarray, ci : np.ndarray, maxIter : int, escape_radius : float = 2.) -> np.ndarray:
+    """Itération d'échappement de chaque point c (maxIter s'il ne s'échappe pas), sans stocker les orbites."""
+    r2 = escape_radius*escape_radius
+    niter  = np.full(cr.size, maxIter, dtype=np.int64)
+    active = np.arange(cr.size)
+    acr, aci = cr, ci
+    zr, zi = cr.copy(), ci.copy()
+    for it in range(maxIter):
+        zr, zi = zr*zr - zi*zi + acr, 2.*zr*zi + aci
+        escaped = zr*zr + zi*zi > r2
+        if escaped.any():
+            niter[active[escaped]] = it
+            keep = ~escaped
+            active, acr, aci, zr, zi = active[keep], acr[keep], aci[keep], zr[keep], zi[keep]
+            if active.size == 0:
+                break
+    return niter
+
+
+class CompactHistogram:
+    """Histogramme à plat en uint32 ; un pixel sur le point de déborder est reporté
+    dans un tampon int64, créé seulement au premier débordement."""
+
+    def __init__(self, size : int):
+        self.counts = np.zeros(size, dtype=np.uint32)
+        self.spill  = None
+
+    @property
+    def size(self) -> int:
+        return self.counts.size
+
+    def add(self, index : np.ndarray, increment : np.ndarray):
+        """Ajoute increment (comptes entiers, chacun < 2**32) aux pixels index, distincts."""
+        full = increment > np.iinfo(np.uint32).max - self.counts[index]
+        if full.any():
+            if self.spill is None:
+                self.spill = np.zeros(self.size, dtype=np.int64)
+            self.spill[index[full]] += self.counts[index[full]]
+            self.counts[index[full]] = 0
+        self.counts[index] += increment.astype(np.uint32)
+
+    def clear(self):
+        self.counts[...] = 0
+        self.spill = None
+
+    def nonzero(self) -> np.ndarray:
+        """Indices des pixels non vides, triés."""
+        if self.spill is None:
+            return np.flatnonzero(self.counts)
+        return np.flatnonzero((self.counts > 0) | (self.spill > 0))
+
+    def values(self, index : np.ndarray) -> np.ndarray:
+        """Comptes int64 des pixels index."""
+        values = self.counts[index].astype(np.int64)
+        if self.spill is not None:
+            values += self.spill[index]
+        return values
+
+    def total(self) -> np.ndarray:
+        """Histogramme int64 complet."""
+        total = self.counts.astype(np.int64)
+        if self.spill is not None:
+            total += self.spill
+        return total
+
+
+def orbit_steps(cr : np.ndarray, ci : np.ndarray, niter : np.ndarray):
+    """Générateur des pas (nb, zr, zi) des orbites z_1 = c, ..., z_{n+1}, n = niter.
+
+    niter doit être trié par ordre décroissant : les points dont l'orbite contient
+    encore le pas courant sont alors les nb premiers, et zr, zi sont de taille nb.
+    """
+    if niter.size == 0:
+        return
+    acr, aci = cr, ci
+    zr, zi = cr.copy(), ci.copy()
+    # Nombre de points dont l'orbite contient encore z_{s+1}, pour chaque pas s
+    remaining = np.searchsorted(-niter, -np.arange(niter[0]+1), side='right')
+    for step in range(niter[0]+1):
+        nb = remaining[step]
+        if step > 0:
+            zr, zi, acr, aci = zr[:nb], zi[:nb], acr[:nb], aci[:nb]
+            zr, zi = zr*zr - zi*zi + acr, 2.*zr*zi + aci
+        yield nb, zr, zi
+
+
+def bin_orbits(cr : np.ndarray, ci : np.ndarray, niter : np.ndarray, offsets : np.ndarray, flat : np.ndarray,
+               width : int, height : int, scratchSize : int = 1 << 18, window : tuple = fullWindow,
+               weights : np.ndarray | None = None):
+    """Ajoute à flat les points z_1 = c, ..., z_{n+1} de l'orbite de chaque c, n = niter.
+
+    flat est un tableau à plat ou un CompactHistogram. offsets donne, pour
+    chaque point, le décalage de son histogramme dans flat ;
+    weights (facultatif, flat réel) le poids de chacun de ses passages.
+    Les points sont réitérés triés par nombre d'itérations décroissant (orbit_steps) ;
+    les pixels visités passent par un tampon de scratchSize indices vidé dans
+    flat par np.bincount, ou, pour un CompactHistogram, par np.unique : seuls
+    les pixels visités sont alors mis à jour, sans histogramme dense temporaire.
+    """
+    order = np.argsort(niter)[::-1]
+    niter, offsets = niter[order], offsets[order].astype(np.int32)
+    if weights is not None:
+        weights = weights[order]
+        scratchWeights = np.empty(max(scratchSize, niter.size), dtype=np.double)
+    scratch = np.empty(max(scratchSize, niter.size), dtype=np.int32)
+    filled = 0
+
+    def flush():
+        nonlocal flat
+        visited = scratch[:filled]
+        kept = visited >= 0
+        if isinstance(flat, CompactHistogram):
+            flat.add(*np.unique(visited[kept], return_counts=True))
+            return
+        w = None if weights is None else scratchWeights[:filled][kept]
+        flat += np.bincount(visited[kept], weights=w, minlength=flat.size)
+
+    for nb, zr, zi in orbit_steps(cr[order], ci[order], niter):
+        if filled + nb > scratch.size:
+            flush()
+            filled = 0
+        index = pixel_index(zr, zi, width, height, window)
+        scratch[filled:filled+nb] = np.where(index >= 0, index + offsets[:nb], -1)
+        if weights is not None:
+            scratchWeights[filled:filled+nb] = weights[:nb]
+        filled += nb
+    flush()
+
+
+def orbit_hits(cr : np.ndarray, ci : np.ndarray, niter : np.ndarray, width : int, height : int,
+               window : tuple = fullWindow) -> np.ndarray:
+    """Nombre de points de l'orbite z_1 = c, ..., z_{n+1} de chaque c (n = niter) qui tombent dans la fenêtre."""
+    order = np.argsort(niter)[::-1]
+    sortedHits = np.zeros(niter.size, dtype=np.int64)
+    for nb, zr, zi in orbit_steps(cr[order], ci[order], niter[order]):
+        sortedHits[:nb] += pixel_index(zr, zi, width, height, window) >= 0
+    hits = np.empty_like(sortedHits)
+    hits[order] = sortedHits
+    return hits
+
+
+def bhuddabrot_batch(cr : np.ndarray, ci : np.ndarray, maxIter : int, image : np.ndarray,
+                     escape_radius : float = 2., scratchSize : int = 1 << 18):
+    """Ajoute à image (width, height) les orbites des points c = cr + i.ci qui s'échappent.
+
+    L'orbite d'un point qui s'échappe à l'itération n est z_1 = c, ..., z_{n+1}
+    (sans le point d'échappement), comme dans MandelbrotSet.count_iterations.
+    Première passe : itérations d'échappement, sans mémoriser les orbites.
+    Seconde passe : les seuls points qui s'échappent sont réitérés et leurs
+    pixels accumulés au fil de l'eau (bin_orbits), à mémoire constante.
+    """
+    width, height = image.shape
+    niter = escape_counts(cr, ci, maxIter, escape_radius)
+    escaping = niter < maxIter
+    bin_orbits(cr[escaping], ci[escaping], niter[escaping], np.zeros(np.count_nonzero(escaping), dtype=np.int32),
+               image.reshape(-1), width, height, scratchSize)
+
+
+def bhuddabrot(nbSamples : int, maxIter : int, width : int, height : int, batchSize : int = 1024,
+               reject : bool = True, symmetric : bool = True) -> np.ndarray:
+    # Avec symmetric, la moitié des échantillons suffit : chacun compte aussi pour son conjugué
+    nbDraws = (nbSamples+1)//2 if symmetric else nbSamples
+    image = np.zeros((width, height), dtype=np.int64)
+    for start in range(0, nbDraws, batchSize):
+        cr, ci = sample_batch(min(batchSize, nbDraws-start), reject, symmetric)
+        bhuddabrot_batch(cr, ci, maxIter, image)
+    return mirror(image) if symmetric else image
+
+
+def nebulabrot(nbSamples : int, channels : tuple, width : int, height : int, batchSize : int = 1024,
+               reject : bool = True, symmetric : bool = True) -> list:
+    """Histogrammes (width, height) de plusieurs canaux en une seule passe sur les échantillons.
+
+    channels est une suite de couples (minIter, maxIter) : l'orbite d'un point
+    qui s'échappe à l'itération n est ajoutée à chaque canal tel que
+    minIter <= n < maxIter. Chaque point n'est itéré qu'une fois, jusqu'au plus
+    grand maxIter. Les bornes découpent les itérations en tranches disjointes ;
+    chaque orbite est accumulée dans l'histogramme de sa tranche, et un canal
+    est la somme des tranches qu'il recouvre.
+    """
+    bounds = np.unique([bound for channel in channels for bound in channel])
+    maxIter = int(bounds[-1])
+    stride : int = width*height
+    nbDraws = (nbSamples+1)//2 if symmetric else nbSamples
+    slices = np.zeros((bounds.size-1)*stride, dtype=np.int64)
+    for start in range(0, nbDraws, batchSize):
+        cr, ci = sample_batch(min(batchSize, nbDraws-start), reject, symmetric)
+        niter = escape_counts(cr, ci, maxIter)
+        band = np.searchsorted(bounds, niter, side='right') - 1
+        kept = (band >= 0) & (niter < maxIter)
+        bin_orbits(cr[kept], ci[kept], niter[kept], band[kept]*stride, slices, width, height)
+    slices = slices.reshape(bounds.size-1, width, height)
+    if symmetric:
+        slices = mirror(slices)
+    return [slices[np.searchsorted(bounds, lo):np.searchsorted(bounds, hi)].sum(axis=0) for lo, hi in channels]
+
+
+def window_contribution(cr : np.ndarray, ci : np.ndarray, maxIter : int, width : int, height : int,
+                        window : tuple) -> tuple:
+    """Contribution f(c) de chaque point à la fenêtre, et son itération d'échappement.
+
+    f(c) est le nombre de points de l'orbite de c dans la fenêtre ; elle est nulle
+    pour les points qui ne s'échappent pas ou hors du disque de rayon 2.
+    """
+    f = np.zeros(cr.size, dtype=np.int64)
+    niter = np.full(cr.size, maxIter, dtype=np.int64)
+    todo = (cr*cr + ci*ci <= 4.) & ~in_main_components(cr, ci)
+    niter[todo] = escape_counts(cr[todo], ci[todo], maxIter)
+    escaping = niter < maxIter
+    f[escaping] = orbit_hits(cr[escaping], ci[escaping], niter[escaping], width, height, window)
+    return f, niter
+
+
+def metropolis_bhuddabrot(nbSteps : int, maxIter : int, width : int, height : int, window : tuple,
+                          nbChains : int = 1024, pGlobal : float = 0.2, mutationRange : tuple = (1.E-4, 0.1),
+                          nbInitial : int = 1 << 16) -> tuple:
+    """Histogramme de Bhuddabrot sur une fenêtre (xmin, xmax, ymin, ymax) par Metropolis-Hastings.
+
+    nbChains chaînes indépendantes, traitées comme des tableaux, parcourent les
+    points c selon la loi p(c) proportionnelle à q(c).f(c), où q est la loi de
+    draw_samples (densité en 1/|c| sur le disque) et f(c) le nombre de points
+    de l'orbite dans la fenêtre (window_contribution). Propositions : avec la
+    probabilité pGlobal un nouveau tirage selon q (rapport d'acceptation
+    f(c')/f(c)), sinon une perturbation de c de rayon log-uniforme dans
+    mutationRange (relatif à la taille de la fenêtre, rapport q(c')f(c')/(q(c)f(c))).
+    Chaque état visité dépose son orbite avec le poids 1/f(c), que multiplie
+    Z = E_q[f], estimé sur nbInitial tirages initiaux et sur les propositions
+    globales : le résultat estime
+    l'histogramme moyen par échantillon de bhuddabrot (à multiplier par le
+    nombre d'échantillons voulu). Renvoie l'histogramme et le taux d'acceptation.
+    """
+    xmin, xmax, ymin, ymax = window
+    span = max(xmax-xmin, ymax-ymin)
+    logLow, logHigh = np.log(span*mutationRange[0]), np.log(span*mutationRange[1])
+    # Initialisation : estimation de Z et tirage des états initiaux parmi les points
+    # qui contribuent, proportionnellement à f (ré-échantillonnage d'importance)
+    total, drawn, poolR, poolI, poolF = 0, 0, [], [], []
+    while drawn < nbInitial or sum(pf.size for pf in poolF) == 0:
+        if drawn >= 64*nbInitial:
+            raise ValueError("Aucune orbite ne traverse la fenêtre")
+        cr, ci = draw_samples(nbChains)
+        f, _ = window_contribution(cr, ci, maxIter, width, height, window)
+        total, drawn = total + f.sum(), drawn + f.size
+        keep = f > 0
+        poolR.append(cr[keep]); poolI.append(ci[keep]); poolF.append(f[keep])
+    poolR, poolI, poolF = np.concatenate(poolR), np.concatenate(poolI), np.concatenate(poolF)
+    chosen = np.random.choice(poolF.size, nbChains, p=poolF/poolF.sum())
+    cr, ci = poolR[chosen], poolI[chosen]
+    f, niter = window_contribution(cr, ci, maxIter, width, height, window)
+
+    image = np.zeros(width*height, dtype=np.double)
+    stay = np.zeros(nbChains, dtype=np.int64)
+    accepted = 0
+    for step in range(nbSteps):
+        isGlobal = np.random.rand(nbChains) < pGlobal
+        gr, gi = draw_samples(nbChains)
+        radius = np.exp(logLow + (logHigh-logLow)*np.random.rand(nbChains))
+        angle  = twoPi*np.random.rand(nbChains)
+        pr = np.where(isGlobal, gr, cr + radius*np.cos(angle))
+        pi_ = np.where(isGlobal, gi, ci + radius*np.sin(angle))
+        fNew, niterNew = window_contribution(pr, pi_, maxIter, width, height, window)
+        # Les propositions globales sont des tirages selon q : elles affinent l'estimation de Z
+        total, drawn = total + fNew[isGlobal].sum(), drawn + np.count_nonzero(isGlobal)
+        ratio = fNew/f
+        ratio[~isGlobal] *= np.hypot(cr, ci)[~isGlobal]/np.maximum(np.hypot(pr, pi_)[~isGlobal], 1.E-300)
+        accept = np.random.rand(nbChains) < ratio
+        # Les chaînes qui changent d'état déposent l'orbite de l'état quitté,
+        # pondérée par le nombre de pas passés dans cet état
+        leaving = accept & (stay > 0)
+        bin_orbits(cr[leaving], ci[leaving], niter[leaving], np.zeros(np.count_nonzero(leaving)), image,
+                   width, height, window=window, weights=stay[leaving]/f[leaving])
+        cr, ci = np.where(accept, pr, cr), np.where(accept, pi_, ci)
+        f, niter = np.where(accept, fNew, f), np.where(accept, niterNew, niter)
+        stay[accept] = 0
+        stay += 1
+        accepted += np.count_nonzero(accept)
+    bin_orbits(cr, ci, niter, np.zeros(nbChains), image, width, height, window=window, weights=stay/f)
+    image *= total/drawn/(nbSteps*nbChains)
+    return image.reshape(width, height), accepted/(nbSteps*nbChains)
+
+
+def make_image(redOrbit : np.ndarray, greenOrbit : np.ndarray, blueOrbit : np.ndarray) -> Image.Image:
+    """Image RGB dont chaque canal est un histogramme normalisé (16 fois la moyenne -> 255)."""
+    width, height = redOrbit.shape
+    stride : int = width*height
+    pixels  = np.empty((width, height, 3), dtype=np.uint8)
+    channel = np.empty((width, height), dtype=np.float32)
+    for k, orbit in enumerate((redOrbit, greenOrbit, blueOrbit)):
+        np.multiply(orbit, 16.*stride/max(np.sum(orbit), 1), out=channel, casting='unsafe')
+        np.clip(channel, 0, 255, out=channel)
+        pixels[:, :, k] = channel
+    return Image.fromarray(pixels, 'RGB')
+
+
+def main():
+    # On peut changer les paramètres des deux prochaines lignes
+    width, height = 1024, 1024
+
+    # Calcul de chaque composante de Bhuddabrot
+    s1 = 1500_000 #150_000
+    s2 =  500_000 # 50_000
+    s3 =    30000 # 3_000
+    mode = sys.argv[1] if len(sys.argv) > 1 else ""
+    deb = time()
+    if mode == "zoom":
+        # Fenêtre agrandie 200 fois, échantillonnée par Metropolis-Hastings
+        print("zoom")
+        orbit, acceptance = metropolis_bhuddabrot(200, 2_000, width, height, window=(-0.11, -0.09, 0.64, 0.66))
+        print(f"Taux d'acceptation : {acceptance:.3f}")
+        redOrbit = greenOrbit = blueOrbit = orbit
+    elif mode == "nebula":
+        # Un seul tirage : le bleu reçoit les orbites longues (2 000 <= n < 10 000)
+        print("red, green, blue")
+        redOrbit, greenOrbit, blueOrbit = nebulabrot(s2, ((0, 2_000), (0, 10_000), (2_000, 10_000)), width, height)
+    else:
+        print("red")
+        redOrbit   = bhuddabrot( s1,  2_000, width, height)
+        print("green")
+        greenOrbit = bhuddabrot(  s2, 10_000, width, height)
+        print("blue")
+        blueOrbit  = bhuddabrot(   s3, 10_000, width, height)
+    fin = time()
+    print(f"Temps du calcul de l'ensemble de Bhuddabrot : {fin-deb}")
+
+    # Constitution de l'image résultante :
+    deb = time()
+    image = make_image(redOrbit, greenOrbit, blueOrbit)
+    fin = time()
+    print(f"Temps de constitution de l'image : {fin-deb}")
+    image.save("bhudda.jpg")
+    image.show()
+
+
+if __name__ == "__main__":
+    main()
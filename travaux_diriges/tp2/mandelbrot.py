@@ -4,13 +4,16 @@ from dataclasses import dataclass
 from PIL import Image
 from math import log
 from time import time
-import matplotlib.cm
+from mandelbrot_colour import colourise, load_lut
 
 
 @dataclass
 class MandelbrotSet:
     max_iterations: int
     escape_radius:  float = 2.0
+    # Détection de périodicité de l'orbite : arrête tôt les points intérieurs
+    periodicity_check:   bool  = False
+    periodicity_epsilon: float = 1.E-10
 
     def __contains__(self, c: complex) -> bool:
         return self.stability(c) == 1
@@ -36,14 +39,33 @@ class MandelbrotSet:
             ctnrm2 = abs(ct)
             if ctnrm2 < 0.5*(1-ct.real/max(ctnrm2, 1.E-14)):
                 return self.max_iterations
-        # Sinon on itère
-        z = 0
+        # Sinon on itère sur les parties réelle et imaginaire séparées,
+        # en comparant |z|² au carré du rayon (pas de racine carrée)
+        cr, ci = c.real, c.imag
+        zr, zi = 0., 0.
+        zr2, zi2 = 0., 0.
+        r2 = self.escape_radius*self.escape_radius
+        # Point de référence de l'orbite, sauvegardé aux itérations 1, 2, 4, 8, ...
+        zr_ref, zi_ref = 0., 0.
+        next_ref = 1
+        eps2 = self.periodicity_epsilon*self.periodicity_epsilon
         for iter in range(self.max_iterations):
-            z = z*z + c
-            if abs(z) > self.escape_radius:
+            zi = 2.*zr*zi + ci
+            zr = zr2 - zi2 + cr
+            zr2, zi2 = zr*zr, zi*zi
+            if zr2 + zi2 > r2:
                 if smooth:
-                    return iter + 1 - log(log(abs(z)))/log(2)
+                    return iter + 1 - log(0.5*log(zr2 + zi2))/log(2)
                 return iter
+            if self.periodicity_check:
+                # L'orbite repasse par le point de référence : elle est périodique,
+                # donc le point appartient à l'ensemble
+                dr, di = zr - zr_ref, zi - zi_ref
+                if dr*dr + di*di < eps2:
+                    return self.max_iterations
+                if iter == next_ref:
+                    zr_ref, zi_ref = zr, zi
+                    next_ref *= 2
         return self.max_iterations
 
 
@@ -65,7 +87,7 @@ print(f"Temps du calcul de l'ensemble de Mandelbrot : {fin-deb}")
 
 # Constitution de l'image résultante :
 deb = time()
-image = Image.fromarray(np.uint8(matplotlib.cm.plasma(convergence.T)*255))
+image = Image.fromarray(colourise(convergence.T, load_lut("plasma")))
 fin = time()
 print(f"Temps de constitution de l'image : {fin-deb}")
 image.show()
@@ -0,0 +1,128 @@
+# Rendu de l'ensemble de Mandelbrot par suivi de frontières (algorithme de Mariani-Silver)
+import numpy as np
+from dataclasses import dataclass
+from PIL import Image
+from time import time
+
+from mandelbrot_colour import colourise, load_lut
+from mandelbrot_vec import MandelbrotSet, pixel_grid
+
+
+@dataclass
+class BoundaryTraceStats:
+    total:    int
+    iterated: int = 0
+    filled:   int = 0
+    tiles:    int = 0
+
+    @property
+    def fraction_iterated(self) -> float:
+        return self.iterated / self.total
+
+
+def _border(x0: int, x1: int, y0: int, y1: int, height: int) -> np.ndarray:
+    """Indices (à plat) des pixels du bord du rectangle [x0,x1[ x [y0,y1[."""
+    ys = np.arange(y0, y1)
+    xs = np.arange(x0 + 1, x1 - 1)
+    return np.concatenate((x0*height + ys, (x1 - 1)*height + ys,
+                           xs*height + y0, xs*height + y1 - 1))
+
+
+def _interior(x0: int, x1: int, y0: int, y1: int, height: int) -> np.ndarray:
+    """Indices (à plat) des pixels strictement intérieurs du rectangle."""
+    xs = np.arange(x0 + 1, x1 - 1)
+    ys = np.arange(y0 + 1, y1 - 1)
+    return (xs[:, np.newaxis]*height + ys[np.newaxis, :]).ravel()
+
+
+def _block(x0: int, x1: int, y0: int, y1: int, height: int) -> np.ndarray:
+    xs = np.arange(x0, x1)
+    ys = np.arange(y0, y1)
+    return (xs[:, np.newaxis]*height + ys[np.newaxis, :]).ravel()
+
+
+def boundary_trace(mandelbrot_set: MandelbrotSet, cr: np.ndarray, ci: np.ndarray, smooth=False,
+                   tolerance: float = 0., min_size: int = 8):
+    """Calcule le nombre d'itérations de chaque pixel en ne calculant que les bords des tuiles.
+
+    Une tuile dont tout le bord a le même nombre d'itérations est remplie sans
+    calcul, sinon elle est découpée en quatre. Le résultat est une approximation,
+    même avec smooth=False et tolerance=0 (comptes entiers) : une tuile peut avoir
+    un bord uniforme et un intérieur différent (quelques pixels sur 1024x1024
+    pour les vues usuelles). En mode lissé le bord est jugé uniforme si son
+    amplitude ne dépasse pas tolerance.
+    Toutes les tuiles d'un même niveau sont évaluées en un seul appel vectorisé
+    à count_iterations. Renvoie le tableau (width, height) et les statistiques.
+    """
+    width, height = cr.shape
+    flat_cr = cr.reshape(-1)
+    flat_ci = ci.reshape(-1)
+    counts = np.empty(width*height, dtype=mandelbrot_set.dtype)
+    computed = np.zeros(width*height, dtype=bool)
+    stats = BoundaryTraceStats(total=width*height)
+
+    def evaluate(idx):
+        idx = idx[~computed[idx]]
+        idx = np.unique(idx)
+        if idx.size == 0:
+            return
+        counts[idx] = mandelbrot_set.count_iterations((flat_cr[idx], flat_ci[idx]), smooth)
+        computed[idx] = True
+        stats.iterated += idx.size
+
+    tiles = [(0, width, 0, height)]
+    while tiles:
+        stats.tiles += len(tiles)
+        borders = [_border(*tile, height) for tile in tiles]
+        evaluate(np.concatenate(borders))
+        next_tiles = []
+        leaves = []
+        for (x0, x1, y0, y1), border in zip(tiles, borders):
+            values = counts[border]
+            if values.max() - values.min() <= tolerance:
+                inner = _interior(x0, x1, y0, y1, height)
+                inner = inner[~computed[inner]]
+                counts[inner] = values[0] if tolerance == 0. else values.mean()
+                computed[inner] = True
+                stats.filled += inner.size
+            elif x1 - x0 <= min_size or y1 - y0 <= min_size:
+                leaves.append(_block(x0, x1, y0, y1, height))
+            else:
+                xm = (x0 + x1)//2
+                ym = (y0 + y1)//2
+                next_tiles += [(x0, xm, y0, ym), (xm, x1, y0, ym), (x0, xm, ym, y1), (xm, x1, ym, y1)]
+        if leaves:
+            evaluate(np.concatenate(leaves))
+        tiles = next_tiles
+    return counts.reshape(width, height), stats
+
+
+def main():
+    # On peut changer les paramètres des deux prochaines lignes
+    mandelbrot_set = MandelbrotSet(max_iterations=200, escape_radius=2.)
+    width, height = 1024, 1024
+
+    cr, ci = pixel_grid(width, height, dtype=mandelbrot_set.dtype)
+    deb = time()
+    counts, stats = boundary_trace(mandelbrot_set, cr, ci)
+    fin = time()
+    print(f"Temps du calcul par suivi de frontières : {fin-deb}")
+    print(f"Pixels itérés : {stats.iterated}/{stats.total} ({100*stats.fraction_iterated:.1f} %), "
+          f"pixels remplis : {stats.filled}, tuiles : {stats.tiles}")
+    # Comparaison avec le calcul direct : sur cette vue à 200 itérations, le
+    # raccourci de la cardioïde de count_iterations économise déjà l'essentiel,
+    # et la boucle python sur les tuiles (et np.unique) rend le suivi de
+    # frontières environ deux fois plus lent (0.6 s contre 0.3 s). Quelques
+    # pixels diffèrent (approximation).
+    deb = time()
+    direct = mandelbrot_set.count_iterations((cr, ci))
+    fin = time()
+    print(f"Temps du calcul direct : {fin-deb}")
+    print(f"Pixels différents du calcul direct : {np.count_nonzero(counts != direct)}")
+
+    image = Image.fromarray(colourise(counts.T, load_lut("plasma"), 0., mandelbrot_set.max_iterations))
+    image.show()
+
+
+if __name__ == "__main__":
+    main()
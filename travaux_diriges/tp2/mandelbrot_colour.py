@@ -0,0 +1,59 @@
+# Coloration des images par table de couleurs (LUT) uint8
+#
+# La table est construite une seule fois (depuis une palette matplotlib ou une liste
+# de couleurs) puis conservée sur disque : les exécutions suivantes n'importent pas
+# matplotlib. La coloration d'une image est un seul np.take dans la table, écrit dans
+# une image uint8 préallouée, sans tableau RGBA intermédiaire en float64.
+import numpy as np
+import hashlib
+import os
+
+LUT_SIZE = 4096
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "mandelbrot_lut")
+
+
+def gradient_lut(stops: list, size: int = LUT_SIZE) -> np.ndarray:
+    """Table (size, 3) interpolant linéairement une liste de (position dans [0,1], (r, g, b))."""
+    positions = np.array([position for position, _ in stops], dtype=np.double)
+    colours = np.array([colour for _, colour in stops], dtype=np.double)
+    t = np.linspace(0., 1., size)
+    lut = np.empty((size, 3), dtype=np.uint8)
+    for k in range(3):
+        lut[:, k] = np.rint(np.interp(t, positions, colours[:, k]))
+    return lut
+
+
+def colormap_lut(name: str, size: int = LUT_SIZE) -> np.ndarray:
+    """Table (size, 3) échantillonnant la palette matplotlib name."""
+    import matplotlib
+    cmap = matplotlib.colormaps[name]
+    return np.uint8(cmap(np.linspace(0., 1., size))[:, :3]*255)
+
+
+def load_lut(spec="plasma", size: int = LUT_SIZE, cache_dir: str | None = CACHE_DIR) -> np.ndarray:
+    """Table de couleurs pour spec (nom de palette matplotlib ou liste de stops), lue en cache si possible."""
+    if cache_dir is None:
+        return colormap_lut(spec, size) if isinstance(spec, str) else gradient_lut(spec, size)
+    key = spec if isinstance(spec, str) else hashlib.md5(repr(spec).encode()).hexdigest()
+    filename = os.path.join(cache_dir, f"{key}_{size}.npy")
+    if os.path.exists(filename):
+        return np.load(filename)
+    lut = colormap_lut(spec, size) if isinstance(spec, str) else gradient_lut(spec, size)
+    os.makedirs(cache_dir, exist_ok=True)
+    np.save(filename, lut)
+    return lut
+
+
+def colourise(values: np.ndarray, lut: np.ndarray, vmin: float = 0., vmax: float = 1.,
+              out: np.ndarray | None = None) -> np.ndarray:
+    """Image uint8 (..., 3) des valeurs (par ex. convergence lissée) ramenées de [vmin, vmax] à la table."""
+    if out is None:
+        out = np.empty(values.shape + (3,), dtype=np.uint8)
+    last = lut.shape[0] - 1
+    position = np.empty(values.shape, dtype=np.float32)
+    np.subtract(values, vmin, out=position, casting="unsafe")
+    np.multiply(position, last/(vmax - vmin), out=position)
+    np.clip(position, 0, last, out=position)
+    index = np.empty(values.shape, dtype=np.int32)
+    np.copyto(index, position, casting="unsafe")
+    return np.take(lut, index, axis=0, out=out)
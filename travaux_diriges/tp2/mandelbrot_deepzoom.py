@@ -0,0 +1,177 @@
+# Zoom profond sur l'ensemble de Mandelbrot par la théorie des perturbations
+#
+# Au-delà d'un zoom d'environ 1e-13, deux pixels voisins ont la même valeur c en
+# double précision. On calcule donc une seule orbite de référence Z_n en haute
+# précision (mpmath si disponible, sinon le module decimal) au centre C de la vue,
+# puis chaque pixel c = C + dc est itéré en double précision sur l'écart
+# dz_n = z_n - Z_n :
+#       dz_{n+1} = 2 Z_n dz_n + dz_n² + dc
+# Lorsque |Z_n + dz_n| < |dz_n| (pixel « glitché ») ou que l'orbite de référence
+# est épuisée, on rebase le pixel : dz <- Z_n + dz et on repart de Z_0 = 0.
+import numpy as np
+from dataclasses import dataclass
+from decimal import Decimal, localcontext
+from PIL import Image
+from math import log, log10
+from time import time
+
+from mandelbrot_colour import colourise, load_lut
+from mandelbrot_vec import MandelbrotSet
+
+try:
+    import mpmath
+except ImportError:
+    mpmath = None
+
+
+@dataclass
+class DeepZoomStats:
+    reference_length: int
+    reference_time:   float
+    pixels_time:      float
+    glitch_rebases:   int   # rebasages dus à un glitch |Z_m + dz| < |dz|
+    restarts:         int   # rebasages de routine en fin d'orbite de référence
+
+
+def reference_orbit(center_re: str, center_im: str, max_iterations: int, escape_radius: float = 2.,
+                    digits: int = 30):
+    """Orbite de référence Z_0 = 0, Z_1, ..., Z_L calculée avec digits chiffres significatifs.
+
+    Les centres sont donnés sous forme de chaînes pour ne pas perdre de précision.
+    L'orbite s'arrête à max_iterations ou dès que Z s'échappe. Renvoie les parties
+    réelle et imaginaire arrondies en double précision.
+    """
+    r2 = escape_radius*escape_radius
+    orbit_re = np.zeros(max_iterations + 1, dtype=np.double)
+    orbit_im = np.zeros(max_iterations + 1, dtype=np.double)
+    length = max_iterations
+    if mpmath is not None:
+        with mpmath.workdps(digits):
+            c = mpmath.mpc(center_re, center_im)
+            z = mpmath.mpc(0)
+            for n in range(1, max_iterations + 1):
+                z = z*z + c
+                orbit_re[n] = float(z.real)
+                orbit_im[n] = float(z.imag)
+                if orbit_re[n]*orbit_re[n] + orbit_im[n]*orbit_im[n] > r2:
+                    length = n
+                    break
+    else:
+        with localcontext() as ctx:
+            ctx.prec = digits
+            cr, ci = Decimal(center_re), Decimal(center_im)
+            zr, zi = Decimal(0), Decimal(0)
+            for n in range(1, max_iterations + 1):
+                zr, zi = zr*zr - zi*zi + cr, 2*zr*zi + ci
+                orbit_re[n] = float(zr)
+                orbit_im[n] = float(zi)
+                if orbit_re[n]*orbit_re[n] + orbit_im[n]*orbit_im[n] > r2:
+                    length = n
+                    break
+    return orbit_re[:length + 1], orbit_im[:length + 1]
+
+
+def perturbation_escape_time(orbit_re: np.ndarray, orbit_im: np.ndarray, dcr: np.ndarray, dci: np.ndarray,
+                             max_iterations: int, escape_radius: float = 2., smooth=False):
+    """Noyau vectorisé sur les écarts dc (tableaux 1D float64) à l'orbite de référence.
+
+    Chaque pixel garde son propre indice m dans l'orbite de référence, remis à
+    zéro lors d'un rebasage. Renvoie les comptes d'itérations, le nombre de
+    rebasages dus à un glitch et le nombre de reprises en fin d'orbite de référence.
+    """
+    length = orbit_re.size - 1
+    r2 = escape_radius*escape_radius
+    out = np.full(dcr.size, max_iterations, dtype=np.double)
+    active = np.arange(dcr.size)
+    dcr = dcr.copy()
+    dci = dci.copy()
+    dzr = np.zeros(dcr.size, dtype=np.double)
+    dzi = np.zeros(dcr.size, dtype=np.double)
+    m = np.zeros(dcr.size, dtype=np.intp)
+    glitch_rebases = restarts = 0
+    for it in range(max_iterations):
+        if active.size == 0:
+            break
+        zr_m = orbit_re[m]
+        zi_m = orbit_im[m]
+        # dz <- 2 Z_m dz + dz² + dc
+        new_dzr = 2.*(zr_m*dzr - zi_m*dzi) + dzr*dzr - dzi*dzi + dcr
+        dzi = 2.*(zr_m*dzi + zi_m*dzr) + 2.*dzr*dzi + dci
+        dzr = new_dzr
+        m += 1
+        # Valeur complète z = Z_m + dz
+        zr = orbit_re[m] + dzr
+        zi = orbit_im[m] + dzi
+        mod2 = zr*zr + zi*zi
+        escaped = mod2 > r2
+        if escaped.any():
+            if smooth:
+                out[active[escaped]] = it + 1 - np.log(0.5*np.log(mod2[escaped]))/log(2)
+            else:
+                out[active[escaped]] = it
+        # Détection de glitch et rebasage sur le début de l'orbite de référence
+        glitch = (mod2 < dzr*dzr + dzi*dzi) & ~escaped
+        restart = (m == length) & ~escaped & ~glitch
+        rebase = glitch | restart
+        if rebase.any():
+            glitch_rebases += int(np.count_nonzero(glitch))
+            restarts += int(np.count_nonzero(restart))
+            dzr[rebase] = zr[rebase]
+            dzi[rebase] = zi[rebase]
+            m[rebase] = 0
+        if escaped.any():
+            keep = ~escaped
+            active, dcr, dci, dzr, dzi, m = active[keep], dcr[keep], dci[keep], dzr[keep], dzi[keep], m[keep]
+    return out, glitch_rebases, restarts
+
+
+def deep_zoom_count_iterations(mandelbrot_set: MandelbrotSet, center_re: str, center_im: str,
+                               scale: float, width: int, height: int, smooth=False, digits: int | None = None):
+    """Nombre d'itérations d'une vue (width, height) centrée en C avec un pas de pixel scale.
+
+    Coût : une orbite de référence en haute précision plus un rendu en double
+    précision. Renvoie le tableau (width, height) et les statistiques.
+    """
+    if digits is None:
+        digits = max(20, int(-log10(scale)) + 20)
+    deb = time()
+    orbit_re, orbit_im = reference_orbit(center_re, center_im, mandelbrot_set.max_iterations,
+                                         mandelbrot_set.escape_radius, digits)
+    reference_time = time() - deb
+
+    dx = scale*(np.arange(width) - 0.5*width)
+    dy = scale*(np.arange(height) - 0.5*height)
+    dcr = np.repeat(dx[:, np.newaxis], height, axis=1).reshape(-1)
+    dci = np.repeat(dy[np.newaxis, :], width, axis=0).reshape(-1)
+    deb = time()
+    counts, glitch_rebases, restarts = perturbation_escape_time(orbit_re, orbit_im, dcr, dci,
+                                                                mandelbrot_set.max_iterations,
+                                                                mandelbrot_set.escape_radius, smooth)
+    stats = DeepZoomStats(reference_length=orbit_re.size - 1, reference_time=reference_time,
+                          pixels_time=time() - deb, glitch_rebases=glitch_rebases, restarts=restarts)
+    return counts.reshape(width, height), stats
+
+
+def main():
+    # On peut changer les paramètres des lignes suivantes
+    mandelbrot_set = MandelbrotSet(max_iterations=5000, escape_radius=2.)
+    width, height = 512, 512
+    center_re = "-0.743614161049683703970625797515246783429364575339119634369020536"
+    center_im = "0.13178985834906744383323215184871688432328358936216252210147636"
+    scale = 1.E-45
+
+    deb = time()
+    counts, stats = deep_zoom_count_iterations(mandelbrot_set, center_re, center_im, scale, width, height,
+                                               smooth=True)
+    fin = time()
+    print(f"Temps du calcul en zoom profond : {fin-deb}")
+    print(f"Orbite de référence : {stats.reference_length} itérations en {stats.reference_time} s, "
+          f"pixels : {stats.pixels_time} s, rebasages (glitchs) : {stats.glitch_rebases}, "
+          f"reprises en fin de référence : {stats.restarts}")
+
+    image = Image.fromarray(colourise(counts.T, load_lut("plasma"), counts.min(), max(counts.max(), counts.min() + 1)))
+    image.show()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# Ensembles de Julia et atlas de Julia sur une grille de paramètres c,
+# calculés avec le même noyau « temps d'échappement » que l'ensemble de Mandelbrot
+import numpy as np
+from PIL import Image
+from time import time
+
+from mandelbrot_colour import colourise, load_lut
+from mandelbrot_vec import MandelbrotSet, escape_time
+
+
+class JuliaSet(MandelbrotSet):
+    """Ensemble de Julia de paramètre c : z0 est le point du plan, c est fixé."""
+
+    def __init__(self, c: complex, max_iterations : int, escape_radius : float = 2., dtype=np.double,
+                 periodicity_check : bool = False, periodicity_epsilon : float | None = None ):
+        super().__init__(max_iterations, escape_radius, dtype, periodicity_check, periodicity_epsilon)
+        self.c = complex(c)
+
+    def _orbit_start(self, z) -> tuple:
+        # z est le point de départ des orbites ; c est le même pour tous les pixels
+        zr, zi = self._split(z)
+        cr = np.full(zr.shape, self.c.real, dtype=self.dtype)
+        ci = np.full(zr.shape, self.c.imag, dtype=self.dtype)
+        return cr, ci, zr, zi
+
+
+def julia_atlas(c_values: np.ndarray, size: int = 64, max_iterations: int = 200, escape_radius: float = 2.,
+                extent: float = 1.6, smooth=True, batch_size: int = 256, dtype=np.double,
+                periodicity_check=True) -> np.ndarray:
+    """Vignettes (len(c_values), size, size) des ensembles de Julia sur [-extent, extent]².
+
+    Les vignettes sont calculées par paquets de batch_size images : chaque paquet
+    est un unique appel au noyau vectorisé, z0 parcourant la grille de la vignette
+    et c étant répété sur les pixels de chaque vignette.
+    """
+    c_values = np.asarray(c_values, dtype=np.complex128).reshape(-1)
+    epsilon = MandelbrotSet(max_iterations, escape_radius, dtype).periodicity_epsilon if periodicity_check else None
+    axis = np.linspace(-extent, extent, size).astype(dtype)
+    atlas = np.empty((c_values.size, size, size), dtype=dtype)
+    for start in range(0, c_values.size, batch_size):
+        c = c_values[start:start + batch_size]
+        zr0 = np.broadcast_to(axis[np.newaxis, :, np.newaxis], (c.size, size, size)).reshape(-1)
+        zi0 = np.broadcast_to(axis[np.newaxis, np.newaxis, :], (c.size, size, size)).reshape(-1)
+        cr = np.repeat(c.real.astype(dtype), size*size)
+        ci = np.repeat(c.imag.astype(dtype), size*size)
+        escape_time(cr, ci, max_iterations, escape_radius, smooth, out=atlas[start:start + c.size].reshape(-1),
+                    periodicity_epsilon=epsilon, zr0=zr0, zi0=zi0)
+    return atlas
+
+
+def main():
+    # Un ensemble de Julia seul, par l'interface commune convergence/count_iterations
+    julia_set = JuliaSet(complex(-0.8, 0.156), max_iterations=100)
+    axis = np.linspace(-1.6, 1.6, 256)
+    z = axis[:, np.newaxis] + 1.j*axis[np.newaxis, :]
+    deb = time()
+    julia_set.convergence(z, smooth=True)
+    fin = time()
+    print(f"Temps du calcul d'un ensemble de Julia {z.shape} : {fin-deb}")
+
+    # On peut changer les paramètres des lignes suivantes
+    nx, ny = 100, 100         # 10 000 vignettes
+    size = 32
+    max_iterations = 100
+
+    c_re = np.linspace(-2., 0.6, nx)
+    c_im = np.linspace(-1.2, 1.2, ny)
+    c_values = (c_re[:, np.newaxis] + 1.j*c_im[np.newaxis, :]).reshape(-1)
+    deb = time()
+    atlas = julia_atlas(c_values, size=size, max_iterations=max_iterations)
+    fin = time()
+    print(f"Temps du calcul de l'atlas de {c_values.size} ensembles de Julia : {fin-deb}")
+
+    # Mosaïque : la vignette (i, j) occupe le bloc (i, j) de l'image
+    mosaic = atlas.reshape(nx, ny, size, size).transpose(0, 2, 1, 3).reshape(nx*size, ny*size)
+    image = Image.fromarray(colourise(mosaic.T, load_lut("plasma"), 0., max_iterations))
+    image.show()
+
+
+if __name__ == "__main__":
+    main()
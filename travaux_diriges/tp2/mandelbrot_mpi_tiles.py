@@ -0,0 +1,122 @@
+# Calcul de l'ensemble de Mandelbrot avec MPI : ferme de tuiles maître-esclave
+#
+# Usage : mpiexec -n 4 python3 mandelbrot_mpi_tiles.py
+#
+# Une tuile est une bande de tile_rows lignes consécutives de l'image (height, width),
+# de sorte qu'elle occupe une tranche contiguë de l'image du maître : les résultats
+# sont reçus (Irecv) directement à leur place, sans sérialisation. Chaque esclave
+# détient toujours deux numéros de tuile d'avance : la tuile en cours et la suivante,
+# reçue pendant le calcul de la première.
+import numpy as np
+from PIL import Image
+from time import time
+from mpi4py import MPI
+
+from mandelbrot_colour import colourise, load_lut
+from mandelbrot_vec import MandelbrotSet
+
+TAG_TASK   = 1
+TAG_RESULT = 2
+
+
+def tile_rows_range(tile: int, tile_rows: int, height: int):
+    return tile*tile_rows, min(height, (tile + 1)*tile_rows)
+
+
+def compute_tile(mandelbrot_set: MandelbrotSet, tile: int, tile_rows: int, width: int, height: int,
+                 out: np.ndarray) -> np.ndarray:
+    """Calcule la bande de lignes de la tuile dans out ; renvoie la partie utile de out."""
+    start, stop = tile_rows_range(tile, tile_rows, height)
+    scaleX = 3. / width
+    scaleY = 2.25 / height
+    x = -2. + scaleX*np.arange(width)
+    y = -1.125 + scaleY*np.arange(start, stop)
+    cr = np.repeat(x[np.newaxis, :], stop - start, axis=0)
+    ci = np.repeat(y[:, np.newaxis], width, axis=1)
+    return mandelbrot_set.convergence((cr, ci), smooth=True, out=out[:stop - start])
+
+
+def master(comm: MPI.Comm, width: int, height: int, tile_rows: int) -> np.ndarray:
+    image = np.empty((height, width), dtype=np.double)
+    nb_tiles = (height + tile_rows - 1)//tile_rows
+    workers = list(range(1, comm.size))
+    pending = {w: [] for w in workers}  # Tuiles confiées à chaque esclave, dans l'ordre
+    next_tile = 0
+
+    def assign(w):
+        nonlocal next_tile
+        task = np.array([next_tile if next_tile < nb_tiles else -1], dtype=np.int64)
+        comm.Send([task, MPI.INT64_T], dest=w, tag=TAG_TASK)
+        if next_tile < nb_tiles:
+            pending[w].append(next_tile)
+            next_tile += 1
+            return True
+        return False
+
+    def post_recv(w):
+        start, stop = tile_rows_range(pending[w][0], tile_rows, height)
+        return comm.Irecv([image[start:stop], MPI.DOUBLE], source=w, tag=TAG_RESULT)
+
+    # Deux tuiles par esclave : la tuile courante et la suivante (préchargement)
+    for w in workers:
+        if assign(w):
+            assign(w)
+    requests = [post_recv(w) if pending[w] else MPI.REQUEST_NULL for w in workers]
+    while True:
+        index = MPI.Request.Waitany(requests)
+        if index == MPI.UNDEFINED:
+            break
+        w = workers[index]
+        pending[w].pop(0)
+        # Si l'esclave n'a plus de tuile en attente, il a déjà reçu -1 et s'est arrêté ;
+        # sinon on lui envoie la tuile suivante (ou -1) pendant qu'il calcule l'autre.
+        if pending[w]:
+            assign(w)
+        requests[index] = post_recv(w) if pending[w] else MPI.REQUEST_NULL
+    return image
+
+
+def worker(comm: MPI.Comm, mandelbrot_set: MandelbrotSet, width: int, height: int, tile_rows: int):
+    buffer = np.empty((tile_rows, width), dtype=np.double)
+    current = np.empty(1, dtype=np.int64)
+    following = np.empty(1, dtype=np.int64)
+    comm.Recv([current, MPI.INT64_T], source=0, tag=TAG_TASK)
+    while current[0] != -1:
+        request = comm.Irecv([following, MPI.INT64_T], source=0, tag=TAG_TASK)
+        tile = compute_tile(mandelbrot_set, int(current[0]), tile_rows, width, height, buffer)
+        comm.Send([tile, MPI.DOUBLE], dest=0, tag=TAG_RESULT)
+        request.Wait()
+        current, following = following, current
+
+
+def render(comm: MPI.Comm, mandelbrot_set: MandelbrotSet, width: int, height: int, tile_rows: int = 16):
+    """Image (height, width) sur le rang 0, None sur les autres rangs."""
+    if comm.size == 1:
+        image = np.empty((height, width), dtype=np.double)
+        for tile in range((height + tile_rows - 1)//tile_rows):
+            start, stop = tile_rows_range(tile, tile_rows, height)
+            compute_tile(mandelbrot_set, tile, tile_rows, width, height, image[start:stop])
+        return image
+    if comm.rank == 0:
+        return master(comm, width, height, tile_rows)
+    worker(comm, mandelbrot_set, width, height, tile_rows)
+    return None
+
+
+def main():
+    globCom = MPI.COMM_WORLD.Dup()
+
+    # On peut changer les paramètres des deux prochaines lignes
+    mandelbrot_set = MandelbrotSet(max_iterations=200, escape_radius=2.)
+    width, height = 1024, 1024
+
+    deb = time()
+    image = render(globCom, mandelbrot_set, width, height)
+    fin = time()
+    if globCom.rank == 0:
+        print(f"Temps du calcul de l'ensemble de Mandelbrot avec {globCom.size} processus : {fin-deb}")
+        Image.fromarray(colourise(image, load_lut("plasma"))).save("mandelbrot_mpi.png")
+
+
+if __name__ == "__main__":
+    main()
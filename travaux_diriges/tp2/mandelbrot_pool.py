@@ -0,0 +1,147 @@
+# Pool persistant de processus pour enchaîner plusieurs rendus de l'ensemble de Mandelbrot
+import numpy as np
+import traceback
+from PIL import Image
+from queue import Empty
+from time import time
+from multiprocessing import Process, Queue, resource_tracker, shared_memory
+
+from mandelbrot_colour import colourise, load_lut
+from mandelbrot_vec import MandelbrotSet
+from mandelbrot_shared_memory import GuidedScheduler, compute_rows
+
+
+def pool_worker(job_queue, done_queue, scheduler):
+    """Attend des rendus sur job_queue et traite leurs lignes jusqu'à la valeur sentinelle None.
+
+    Chaque rendu est conclu sur done_queue par "done", ou par le couple
+    (exception, trace) si le calcul a échoué ; le processus attend alors le rendu suivant.
+    """
+    attached = {}
+    done_queue.put("ready")
+    job = job_queue.get()
+    while job is not None:
+        shm_name, shape, dtype, x_min, y_min, scaleX, scaleY, mandelbrot_set = job
+        # On ne s'attache qu'une fois à chaque zone de mémoire partagée
+        if shm_name not in attached:
+            for old in attached.values():
+                old.close()
+            attached = {shm_name: shared_memory.SharedMemory(name=shm_name)}
+        result = np.ndarray(shape, dtype=dtype, buffer=attached[shm_name].buf)
+        try:
+            chunk = scheduler.next_chunk()
+            while chunk is not None:
+                compute_rows(result, *chunk, shape[1], scaleX, scaleY, mandelbrot_set, x_min, y_min)
+                chunk = scheduler.next_chunk()
+            answer = "done"
+        except Exception as error:
+            answer = (error, traceback.format_exc())
+        del result
+        done_queue.put(answer)
+        job = job_queue.get()
+    for shm in attached.values():
+        shm.close()
+
+
+class RenderPool:
+    """Processus de calcul démarrés une fois puis réutilisés pour des rendus successifs.
+
+    Le temps de démarrage (start_time) est mesuré à part de la latence de chaque
+    rendu (job_times). Le résultat est écrit en mémoire partagée, agrandie au besoin.
+    """
+
+    def __init__(self, nbp: int, min_chunk: int = 4):
+        self.nbp        = nbp
+        self.job_times  = []
+        deb = time()
+        # Les processus doivent hériter du resource_tracker du maître, sinon chacun
+        # lance le sien et libère les zones partagées à sa terminaison
+        resource_tracker.ensure_running()
+        self.scheduler  = GuidedScheduler(0, nbp, min_chunk)
+        self.done_queue = Queue()
+        self.job_queues = [Queue() for _ in range(nbp)]
+        self.workers    = [Process(target=pool_worker, args=(q, self.done_queue, self.scheduler))
+                           for q in self.job_queues]
+        for p in self.workers:
+            p.start()
+        self._wait_workers()
+        self.start_time = time() - deb
+        self.shm = None
+
+    def render(self, mandelbrot_set: MandelbrotSet, width: int, height: int, x_min: float = -2.,
+               x_max: float = 1., y_min: float = -1.125, y_max: float = 1.125) -> np.ndarray:
+        """Tableau convergence (width, height) de la vue [x_min, x_max[ x [y_min, y_max[."""
+        deb = time()
+        dtype = mandelbrot_set.dtype
+        size = width*height*dtype.itemsize
+        if self.shm is None or self.shm.size < size:
+            self._release()
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+        self.scheduler.reset(height)
+        job = (self.shm.name, (height, width), dtype, x_min, y_min,
+               (x_max - x_min)/width, (y_max - y_min)/height, mandelbrot_set)
+        for q in self.job_queues:
+            q.put(job)
+        self._wait_workers()
+        convergence = np.ndarray((height, width), dtype=dtype, buffer=self.shm.buf).T.copy()
+        self.job_times.append(time() - deb)
+        return convergence
+
+    def _wait_workers(self):
+        # Une réponse par processus ; l'erreur d'un processus est relevée une fois
+        # toutes les réponses reçues, pour que le pool reste utilisable
+        errors = []
+        for _ in range(self.nbp):
+            while True:
+                try:
+                    answer = self.done_queue.get(timeout=0.1)
+                    break
+                except Empty:
+                    if not all(p.is_alive() for p in self.workers):
+                        raise RuntimeError("Un processus de calcul du pool s'est arrêté") from None
+            if answer not in ("ready", "done"):
+                errors.append(answer)
+        if errors:
+            error, trace = errors[0]
+            raise error from RuntimeError(f"Échec dans un processus de calcul :\n{trace}")
+
+    def _release(self):
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    def close(self):
+        for q in self.job_queues:
+            q.put(None)
+        for p in self.workers:
+            p.join()
+        self._release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    width, height = 1024, 1024
+
+    nbp_list = [1, 2, 4, 8]  # Different numbers of processes to test
+    for nbp in nbp_list:
+        with RenderPool(nbp) as pool:
+            print(f"Démarrage du pool de {nbp} processus : {pool.start_time}")
+            # Plusieurs rendus successifs avec le même pool : zoom et budgets différents
+            for max_iterations, zoom in [(50, 1.), (200, 4.), (1000, 16.)]:
+                mandelbrot_set = MandelbrotSet(max_iterations=max_iterations, escape_radius=10)
+                cx, cy, dx, dy = -0.75, 0.1, 1.5/zoom, 1.125/zoom
+                convergence = pool.render(mandelbrot_set, width, height, cx - dx, cx + dx, cy - dy, cy + dy)
+                print(f"  Rendu (max_iterations={max_iterations}, zoom={zoom}) : {pool.job_times[-1]}")
+
+    image = Image.fromarray(colourise(convergence.T, load_lut("plasma")))
+    image.show()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+# Rendu progressif (du grossier au fin) de l'ensemble de Mandelbrot
+import numpy as np
+from PIL import Image
+from time import time
+
+from mandelbrot_colour import colourise, load_lut
+from mandelbrot_vec import MandelbrotSet, pixel_grid
+
+
+def progressive_render(mandelbrot_set: MandelbrotSet, cr: np.ndarray, ci: np.ndarray, smooth=True,
+                       strides=(4, 2, 1)):
+    """Générateur d'images de plus en plus fines de la vue décrite par cr, ci (forme (width, height)).
+
+    Au niveau de pas s on calcule les pixels (x, y) multiples de s qui ne l'ont pas
+    encore été aux niveaux précédents, puis chaque pixel de l'image est rempli par
+    la valeur du pixel calculé le plus proche (en haut à gauche). Avec les pas
+    (4, 2, 1), on affiche d'abord 1/16 puis 1/4 des pixels, puis l'image exacte.
+    Chaque itération fournit (pas, image) ; l'image est un tableau partagé entre
+    les niveaux, à copier si on veut la conserver.
+    """
+    width, height = cr.shape
+    counts = np.empty((width, height), dtype=mandelbrot_set.dtype)
+    computed = np.zeros((width, height), dtype=bool)
+    image = np.empty((width, height), dtype=mandelbrot_set.dtype)
+    for stride in strides:
+        todo = np.zeros((width, height), dtype=bool)
+        todo[::stride, ::stride] = True
+        todo &= ~computed
+        counts[todo] = mandelbrot_set.count_iterations((cr[todo], ci[todo]), smooth)
+        computed |= todo
+        # Remplissage par blocs stride x stride à partir des pixels calculés
+        coarse = counts[::stride, ::stride]
+        block = np.repeat(np.repeat(coarse, stride, axis=0), stride, axis=1)
+        image[:] = block[:width, :height]
+        yield stride, image
+
+
+def main():
+    # On peut changer les paramètres des deux prochaines lignes
+    mandelbrot_set = MandelbrotSet(max_iterations=200, escape_radius=2.)
+    width, height = 1024, 1024
+
+    cr, ci = pixel_grid(width, height, dtype=mandelbrot_set.dtype)
+    deb = time()
+    for stride, counts in progressive_render(mandelbrot_set, cr, ci):
+        print(f"Image au pas {stride} disponible après {time()-deb} s")
+    image = Image.fromarray(colourise(counts.T, load_lut("plasma"), 0., mandelbrot_set.max_iterations))
+    image.show()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# Calcul parallèle de l'ensemble de Mandelbrot : résultat en mémoire partagée
+# et distribution des lignes par ordonnancement « guidé »
+import numpy as np
+from PIL import Image
+from time import time
+from multiprocessing import Process, RawValue, Value, shared_memory
+
+from mandelbrot_colour import colourise, load_lut
+from mandelbrot_vec import MandelbrotSet
+
+
+class GuidedScheduler:
+    """Distribue des paquets de lignes de taille décroissante (grands au début, petits à la fin).
+
+    Chaque demande reçoit max(min_chunk, restant/(2*nb_workers)) lignes : peu
+    d'accès au compteur partagé au début, et un bon équilibrage en fin de calcul.
+    """
+
+    def __init__(self, nb_tasks: int, nb_workers: int, min_chunk: int = 1):
+        # Compteurs partagés entre processus, protégés par le verrou de next_task
+        self.nb_tasks   = RawValue('l', nb_tasks)
+        self.nb_workers = nb_workers
+        self.min_chunk  = min_chunk
+        self.next_task  = Value('l', 0)
+
+    def reset(self, nb_tasks: int):
+        with self.next_task.get_lock():
+            self.nb_tasks.value = nb_tasks
+            self.next_task.value = 0
+
+    def next_chunk(self):
+        """Intervalle [début, fin[ du prochain paquet de lignes, ou None s'il n'y en a plus."""
+        with self.next_task.get_lock():
+            start = self.next_task.value
+            nb_tasks = self.nb_tasks.value
+            if start >= nb_tasks:
+                return None
+            size = max(self.min_chunk, (nb_tasks - start)//(2*self.nb_workers))
+            stop = min(nb_tasks, start + size)
+            self.next_task.value = stop
+        return start, stop
+
+
+def compute_rows(result: np.ndarray, start: int, stop: int, width: int, scaleX: float, scaleY: float,
+                 mandelbrot_set: MandelbrotSet, x_min: float = -2., y_min: float = -1.125):
+    """Calcule les lignes [start, stop[ directement dans le tableau résultat (height, width)."""
+    x = x_min + scaleX*np.arange(width)
+    y = y_min + scaleY*np.arange(start, stop)
+    cr = np.repeat(x[np.newaxis, :], stop - start, axis=0)
+    ci = np.repeat(y[:, np.newaxis], width, axis=1)
+    mandelbrot_set.convergence((cr, ci), smooth=True, out=result[start:stop])
+
+
+def worker(shm_name, shape, dtype, scheduler, scaleX, scaleY, mandelbrot_set):
+    """Récupère des paquets de lignes jusqu'à épuisement et écrit en mémoire partagée."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    result = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    chunk = scheduler.next_chunk()
+    while chunk is not None:
+        compute_rows(result, *chunk, shape[1], scaleX, scaleY, mandelbrot_set)
+        chunk = scheduler.next_chunk()
+    del result
+    shm.close()
+
+
+def render(mandelbrot_set: MandelbrotSet, width: int, height: int, nbp: int, min_chunk: int = 4) -> np.ndarray:
+    """Tableau convergence (width, height) calculé par nbp processus."""
+    scaleX = 3. / width
+    scaleY = 2.25 / height
+    dtype = mandelbrot_set.dtype
+    # Lignes contiguës en mémoire : chaque paquet est une tranche contiguë du résultat
+    shm = shared_memory.SharedMemory(create=True, size=width*height*dtype.itemsize)
+    try:
+        scheduler = GuidedScheduler(height, nbp, min_chunk)
+        workers = [Process(target=worker, args=(shm.name, (height, width), dtype, scheduler,
+                                                scaleX, scaleY, mandelbrot_set))
+                   for _ in range(nbp)]
+        for p in workers:
+            p.start()
+        for p in workers:
+            p.join()
+        # Un processus qui a échoué laisse des lignes non calculées dans la mémoire partagée
+        failed = [p.exitcode for p in workers if p.exitcode != 0]
+        if failed:
+            raise RuntimeError(f"{len(failed)} processus de calcul ont échoué (codes de sortie {failed})")
+        convergence = np.ndarray((height, width), dtype=dtype, buffer=shm.buf).T.copy()
+    finally:
+        shm.close()
+        shm.unlink()
+    return convergence
+
+
+def main():
+    mandelbrot_set = MandelbrotSet(max_iterations=50, escape_radius=10)
+    width, height = 1024, 1024
+
+    nbp_list = [1, 2, 4, 8]  # Different numbers of processes to test
+    for nbp in nbp_list:
+        deb = time()
+        convergence = render(mandelbrot_set, width, height, nbp)
+        fin = time()
+        print(f"Temps du calcul de l'ensemble de Mandelbrot avec {nbp} processus : {fin - deb}")
+
+        # Calculate speedup
+        if nbp == 1:
+            time_1 = fin - deb
+        else:
+            speedup = time_1 / (fin - deb)
+            print(f"Accélération avec {nbp} processus : {speedup}")
+
+    image = Image.fromarray(colourise(convergence.T, load_lut("plasma")))
+    image.show()
+
+
+if __name__ == "__main__":
+    main()
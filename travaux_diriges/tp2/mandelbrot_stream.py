@@ -0,0 +1,97 @@
+# Rendu de très grandes images de l'ensemble de Mandelbrot par bandes, écrites au fil de l'eau
+#
+# Ni le tableau convergence complet ni une image RGBA en float64 ne sont construits :
+# chaque bande horizontale est calculée, colorée par une table de couleurs uint8
+# précalculée, puis écrite dans un fichier PNG (ou brut RGB). La mémoire utilisée
+# est celle d'une bande, quelle que soit la taille de l'image.
+import numpy as np
+import struct
+import zlib
+from time import time
+
+from mandelbrot_colour import colourise, load_lut
+from mandelbrot_vec import MandelbrotSet
+
+
+class PngStreamWriter:
+    """Écrit un PNG RGB 8 bits ligne à ligne : chaque bande est compressée et ajoutée en bloc IDAT."""
+
+    def __init__(self, filename: str, width: int, height: int, level: int = 6):
+        self.width = width
+        self.file = open(filename, "wb")
+        self.compressor = zlib.compressobj(level)
+        self.file.write(b"\x89PNG\r\n\x1a\n")
+        self._chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+
+    def _chunk(self, tag: bytes, data: bytes):
+        self.file.write(struct.pack(">I", len(data)) + tag + data)
+        self.file.write(struct.pack(">I", zlib.crc32(tag + data) & 0xffffffff))
+
+    def write_rows(self, rgb: np.ndarray):
+        # Chaque ligne d'un PNG commence par son type de filtre (0 : aucun)
+        raw = np.empty((rgb.shape[0], 1 + 3*self.width), dtype=np.uint8)
+        raw[:, 0] = 0
+        raw[:, 1:] = rgb.reshape(rgb.shape[0], -1)
+        data = self.compressor.compress(raw.tobytes())
+        if data:
+            self._chunk(b"IDAT", data)
+
+    def close(self):
+        self._chunk(b"IDAT", self.compressor.flush())
+        self._chunk(b"IEND", b"")
+        self.file.close()
+
+
+class RawStreamWriter:
+    """Écrit les pixels RGB uint8 à la suite, ligne à ligne, sans en-tête."""
+
+    def __init__(self, filename: str, width: int, height: int):
+        self.file = open(filename, "wb")
+
+    def write_rows(self, rgb: np.ndarray):
+        self.file.write(np.ascontiguousarray(rgb).tobytes())
+
+    def close(self):
+        self.file.close()
+
+
+def stream_render(mandelbrot_set: MandelbrotSet, filename: str, width: int, height: int, band_rows: int = 256,
+                  x_min: float = -2., x_max: float = 1., y_min: float = -1.125, y_max: float = 1.125,
+                  lut: np.ndarray | None = None):
+    """Calcule et écrit l'image bande par bande (PNG si filename finit par .png, brut RGB sinon)."""
+    if lut is None:
+        lut = load_lut("plasma")
+    writer_class = PngStreamWriter if filename.endswith(".png") else RawStreamWriter
+    writer = writer_class(filename, width, height)
+    dtype = mandelbrot_set.dtype
+    x = (x_min + (x_max - x_min)/width*np.arange(width)).astype(dtype)
+    # Tampons d'une bande, réutilisés d'une bande à l'autre
+    cr = np.empty((band_rows, width), dtype=dtype)
+    ci = np.empty((band_rows, width), dtype=dtype)
+    convergence = np.empty((band_rows, width), dtype=dtype)
+    rgb = np.empty((band_rows, width, 3), dtype=np.uint8)
+    try:
+        for start in range(0, height, band_rows):
+            rows = min(band_rows, height - start)
+            cr[:rows] = x[np.newaxis, :]
+            ci[:rows] = (y_min + (y_max - y_min)/height*np.arange(start, start + rows))[:, np.newaxis]
+            mandelbrot_set.convergence((cr[:rows], ci[:rows]), smooth=True, out=convergence[:rows])
+            colourise(convergence[:rows], lut, out=rgb[:rows])
+            writer.write_rows(rgb[:rows])
+    finally:
+        writer.close()
+
+
+def main():
+    # On peut changer les paramètres des deux prochaines lignes
+    mandelbrot_set = MandelbrotSet(max_iterations=200, escape_radius=2., dtype=np.float32)
+    width, height = 8192, 6144
+
+    deb = time()
+    stream_render(mandelbrot_set, "mandelbrot_poster.png", width, height)
+    fin = time()
+    print(f"Temps du rendu par bandes de l'image {width}x{height} : {fin-deb}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+# Rendu par tuiles de l'ensemble de Mandelbrot avec cache LRU pour l'exploration interactive
+import numpy as np
+import os
+from collections import OrderedDict
+from PIL import Image
+from time import time
+
+from mandelbrot_colour import colourise, load_lut
+from mandelbrot_vec import MandelbrotSet
+
+
+class TileCache:
+    """Cache LRU de tuiles borné en octets, avec un second niveau optionnel sur disque.
+
+    Les tuiles évincées de la mémoire restent disponibles sur disque (fichiers
+    .npy relus en memmap) si directory est donné.
+    """
+
+    def __init__(self, max_bytes: int = 256*2**20, directory: str | None = None):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.nbytes    = 0
+        self.hits      = 0
+        self.disk_hits = 0
+        self.misses    = 0
+        self._tiles    = OrderedDict()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key) -> str:
+        return os.path.join(self.directory, "tile_" + "_".join(str(k) for k in key) + ".npy")
+
+    def get(self, key) -> np.ndarray | None:
+        tile = self._tiles.get(key)
+        if tile is not None:
+            self._tiles.move_to_end(key)
+            self.hits += 1
+            return tile
+        if self.directory is not None and os.path.exists(self._path(key)):
+            self.disk_hits += 1
+            tile = np.load(self._path(key), mmap_mode='r')
+            self._insert(key, tile)
+            return tile
+        self.misses += 1
+        return None
+
+    def put(self, key, tile: np.ndarray):
+        if self.directory is not None:
+            np.save(self._path(key), tile)
+        self._insert(key, tile)
+
+    def _insert(self, key, tile: np.ndarray):
+        if key in self._tiles:
+            self.nbytes -= self._tiles.pop(key).nbytes
+        self._tiles[key] = tile
+        self.nbytes += tile.nbytes
+        # Éviction des tuiles les moins récemment utilisées
+        while self.nbytes > self.max_bytes and len(self._tiles) > 1:
+            _, old = self._tiles.popitem(last=False)
+            self.nbytes -= old.nbytes
+
+    def __len__(self) -> int:
+        return len(self._tiles)
+
+
+class TileRenderer:
+    """Découpe le plan complexe en tuiles de tile_size pixels à chaque niveau de zoom.
+
+    Au niveau zoom, un pixel mesure base_scale/2**zoom et le pixel global (px, py)
+    correspond à c = (px + i.py)*scale. La tuile (tx, ty) couvre les pixels
+    [tx*tile_size, (tx+1)*tile_size[ x [ty*tile_size, (ty+1)*tile_size[.
+    """
+
+    def __init__(self, mandelbrot_set: MandelbrotSet, tile_size: int = 256, base_scale: float = 4./256,
+                 cache: TileCache | None = None, smooth=True):
+        self.mandelbrot_set = mandelbrot_set
+        self.tile_size      = tile_size
+        self.base_scale     = base_scale
+        self.cache          = cache if cache is not None else TileCache()
+        self.smooth         = smooth
+        self.computed_tiles = 0
+
+    def key(self, zoom: int, tx: int, ty: int) -> tuple:
+        # Tout ce qui change les valeurs d'une tuile fait partie de la clé (et du nom de fichier)
+        m = self.mandelbrot_set
+        epsilon = m.periodicity_epsilon if m.periodicity_check else None
+        return (zoom, tx, ty, m.max_iterations, m.escape_radius, np.dtype(m.dtype).name,
+                "smooth" if self.smooth else "count", epsilon, self.tile_size, self.base_scale)
+
+    def _compute(self, tiles: list) -> list:
+        # Toutes les tuiles manquantes sont calculées en un seul appel vectorisé
+        size = self.tile_size
+        pixels = np.arange(size)
+        cr = np.empty((len(tiles), size, size), dtype=self.mandelbrot_set.dtype)
+        ci = np.empty((len(tiles), size, size), dtype=self.mandelbrot_set.dtype)
+        for k, (zoom, tx, ty) in enumerate(tiles):
+            scale = self.base_scale/2**zoom
+            cr[k] = ((tx*size + pixels)*scale)[:, np.newaxis]
+            ci[k] = ((ty*size + pixels)*scale)[np.newaxis, :]
+        counts = self.mandelbrot_set.count_iterations((cr, ci), smooth=self.smooth)
+        self.computed_tiles += len(tiles)
+        return [tile.copy() for tile in counts]
+
+    def tiles(self, zoom: int, tile_indices: list) -> list:
+        """Tuiles (tx, ty) du niveau zoom, prises dans le cache ou calculées."""
+        result = [self.cache.get(self.key(zoom, tx, ty)) for tx, ty in tile_indices]
+        missing = [k for k, tile in enumerate(result) if tile is None]
+        if missing:
+            computed = self._compute([(zoom,) + tile_indices[k] for k in missing])
+            for k, tile in zip(missing, computed):
+                self.cache.put(self.key(zoom, *tile_indices[k]), tile)
+                result[k] = tile
+        return result
+
+    def render(self, zoom: int, x0: int, y0: int, width: int, height: int) -> np.ndarray:
+        """Vue (width, height) dont le coin est le pixel global (x0, y0) du niveau zoom."""
+        size = self.tile_size
+        tx_range = range(x0//size, (x0 + width - 1)//size + 1)
+        ty_range = range(y0//size, (y0 + height - 1)//size + 1)
+        indices = [(tx, ty) for tx in tx_range for ty in ty_range]
+        view = np.empty((width, height), dtype=self.mandelbrot_set.dtype)
+        for (tx, ty), tile in zip(indices, self.tiles(zoom, indices)):
+            # Intersection de la tuile avec la vue
+            ax, bx = max(x0, tx*size), min(x0 + width, (tx + 1)*size)
+            ay, by = max(y0, ty*size), min(y0 + height, (ty + 1)*size)
+            view[ax - x0:bx - x0, ay - y0:by - y0] = tile[ax - tx*size:bx - tx*size, ay - ty*size:by - ty*size]
+        return view
+
+
+def main():
+    # On peut changer les paramètres des deux prochaines lignes
+    mandelbrot_set = MandelbrotSet(max_iterations=200, escape_radius=2.)
+    width, height = 1024, 768
+
+    renderer = TileRenderer(mandelbrot_set, tile_size=128, cache=TileCache(max_bytes=128*2**20))
+    zoom = 2
+    # Vue centrée sur -0.5 + 0i, puis déplacements successifs et retour au point de départ
+    x0 = int(-0.5/(renderer.base_scale/2**zoom)) - width//2
+    y0 = -height//2
+    for dx, dy in [(0, 0), (100, 0), (100, 60), (0, 0)]:
+        computed = renderer.computed_tiles
+        deb = time()
+        view = renderer.render(zoom, x0 + dx, y0 + dy, width, height)
+        fin = time()
+        print(f"Vue décalée de ({dx}, {dy}) : {fin-deb} s, tuiles calculées : {renderer.computed_tiles - computed}")
+    print(f"Cache : {len(renderer.cache)} tuiles, {renderer.cache.nbytes/2**20:.1f} Mo, "
+          f"{renderer.cache.hits} succès, {renderer.cache.misses} défauts")
+
+    image = Image.fromarray(colourise(view.T, load_lut("plasma"), 0., mandelbrot_set.max_iterations))
+    image.show()
+
+
+if __name__ == "__main__":
+    main()
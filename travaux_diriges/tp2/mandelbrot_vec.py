@@ -1,74 +1,276 @@
 # Calcul de l'ensemble de Mandelbrot en python
 import numpy as np
-from dataclasses import dataclass
 from PIL import Image
 from math import log
 from time import time
-import matplotlib.cm
+
+from mandelbrot_colour import colourise, load_lut
+
+
+def in_main_components(cr: np.ndarray, ci: np.ndarray) -> np.ndarray:
+    """Masque des points appartenant à la cardioïde principale ou au disque de période 2."""
+    # Ces points appartiennent à l'ensemble : inutile de les itérer.
+    xq = cr - 0.25
+    q = xq*xq + ci*ci
+    cardioid = q*(q + xq) < 0.25*ci*ci
+    bulb = (cr + 1.)*(cr + 1.) + ci*ci < 0.0625
+    return cardioid | bulb
+
+
+def escape_time(cr: np.ndarray, ci: np.ndarray, max_iterations: int, escape_radius: float = 2.,
+                smooth=False, out: np.ndarray | None = None,
+                periodicity_epsilon: float | None = None,
+                state: "EscapeTimeState | None" = None,
+                zr0: np.ndarray | None = None, zi0: np.ndarray | None = None) -> np.ndarray:
+    """Noyau « temps d'échappement » sur parties réelle et imaginaire séparées.
+
+    cr et ci sont des tableaux 1D de même type (float32 ou float64). On compare
+    |z|² au carré du rayon d'échappement (pas de racine carrée dans la boucle),
+    les tampons de travail sont alloués une fois et réutilisés via out=, et les
+    points ayant divergé sont retirés de l'ensemble actif au fil des itérations.
+
+    Si periodicity_epsilon est donné, on sauvegarde z aux itérations 1, 2, 4, 8...
+    et un point dont l'orbite revient à moins de epsilon de cette référence est
+    déclaré intérieur (max_iterations) sans épuiser le budget d'itérations.
+
+    Si state est donné, le calcul reprend là où le précédent s'est arrêté :
+    seuls les points encore indécis sont itérés, de state.iterations jusqu'à
+    max_iterations, et state est mis à jour en fin de calcul. Un état d'une autre
+    taille, ou déjà itéré au-delà de max_iterations, lève ValueError.
+
+    zr0, zi0 donnent une valeur initiale de z propre à chaque point (z0 = 0 par
+    défaut) : avec c constant et z0 variable, on obtient un ensemble de Julia.
+    Le test de la cardioïde ne vaut alors plus et n'est pas appliqué.
+    """
+    dtype = np.result_type(cr, ci)
+    if out is None:
+        out = np.empty(cr.size, dtype=dtype)
+    r2 = dtype.type(escape_radius*escape_radius)
+
+    start = 0 if state is None else state.iterations
+    if state is not None and state.zr.size != cr.size:
+        raise ValueError(f"L'état à poursuivre a {state.zr.size} points, le calcul en demande {cr.size}")
+    if max_iterations < start:
+        raise ValueError(f"L'état à poursuivre a déjà {start} itérations, plus que le budget de {max_iterations}")
+    if start == 0:
+        out.fill(max_iterations)
+        if zr0 is None:
+            interior = in_main_components(cr, ci)
+        else:
+            interior = np.zeros(cr.size, dtype=bool)
+        active = np.flatnonzero(~interior)
+    else:
+        out[:] = state.counts
+        interior = state.interior.copy()
+        active = np.flatnonzero(~state.done)
+        out[active] = max_iterations
+        out[interior] = max_iterations
+    acr = cr[active]
+    aci = ci[active]
+    n = active.size
+    if start == 0 and zr0 is None:
+        zr = np.zeros(n, dtype=dtype)
+        zi = np.zeros(n, dtype=dtype)
+    elif start == 0:
+        zr = zr0[active].astype(dtype)
+        zi = zi0[active].astype(dtype)
+    else:
+        zr = state.zr[active]
+        zi = state.zi[active]
+    zr2 = zr*zr
+    zi2 = zi*zi
+    tmp = np.empty(n, dtype=dtype)
+    mod2 = np.empty(n, dtype=dtype)
+    escaped = np.empty(n, dtype=bool)
+    check = periodicity_epsilon is not None
+    if check:
+        eps2 = dtype.type(periodicity_epsilon*periodicity_epsilon)
+        zr_ref = zr.copy()
+        zi_ref = zi.copy()
+        periodic = np.empty(n, dtype=bool)
+        next_ref = max(1, 2*start)
+    for it in range(start, max_iterations):
+        if n == 0:
+            break
+        # z <- z*z + c, avec z = zr + i.zi
+        np.multiply(zr, zi, out=tmp)
+        np.add(tmp, tmp, out=zi)
+        zi += aci
+        np.subtract(zr2, zi2, out=zr)
+        zr += acr
+        np.multiply(zr, zr, out=zr2)
+        np.multiply(zi, zi, out=zi2)
+        np.add(zr2, zi2, out=mod2)
+        np.greater(mod2, r2, out=escaped)
+        has_escaped = escaped.any()
+        if has_escaped:
+            if smooth:
+                # log(log|z|) = log(0.5*log|z|²)
+                out[active[escaped]] = it + 1 - np.log(0.5*np.log(mod2[escaped]))/log(2)
+            else:
+                out[active[escaped]] = it
+        has_cycled = False
+        if check:
+            # |z - z_ref|² < eps² : orbite périodique, le point reste à max_iterations
+            np.subtract(zr, zr_ref, out=tmp)
+            np.multiply(tmp, tmp, out=mod2)
+            np.subtract(zi, zi_ref, out=tmp)
+            np.multiply(tmp, tmp, out=tmp)
+            mod2 += tmp
+            np.less(mod2, eps2, out=periodic)
+            has_cycled = periodic.any()
+            if has_cycled:
+                interior[active[periodic & ~escaped]] = True
+                escaped |= periodic
+            if it == next_ref:
+                zr_ref[:] = zr
+                zi_ref[:] = zi
+                next_ref *= 2
+        if not (has_escaped or has_cycled):
+            continue
+        # On compacte les points encore actifs en tête des tampons
+        keep = np.logical_not(escaped, out=escaped)
+        n = np.count_nonzero(keep)
+        buffers = (zr, zi, zr2, zi2, acr, aci, active) + ((zr_ref, zi_ref) if check else ())
+        for arr in buffers:
+            arr[:n] = arr[keep]
+        zr, zi, zr2, zi2 = zr[:n], zi[:n], zr2[:n], zi2[:n]
+        acr, aci, active = acr[:n], aci[:n], active[:n]
+        tmp, mod2, escaped = tmp[:n], mod2[:n], escaped[:n]
+        if check:
+            zr_ref, zi_ref, periodic = zr_ref[:n], zi_ref[:n], periodic[:n]
+    if state is not None:
+        # Les points encore actifs sont les seuls indécis
+        state.done.fill(True)
+        state.done[active] = False
+        state.zr[active] = zr
+        state.zi[active] = zi
+        state.interior[:] = interior
+        state.counts[:] = out
+        state.iterations = max_iterations
+    return out
+
+
+class EscapeTimeState:
+    """État par pixel d'un rendu, pour le poursuivre avec un budget d'itérations plus grand.
+
+    zr, zi : dernière valeur de z des points indécis ; counts : comptes
+    d'itérations obtenus ; done : points décidés (échappés ou intérieurs) ;
+    interior : points décidés intérieurs (cardioïde, disque ou orbite périodique) ;
+    iterations : budget atteint par les points indécis.
+    """
+
+    def __init__(self, size: int, dtype=np.double, smooth=False):
+        self.zr         = np.zeros(size, dtype=dtype)
+        self.zi         = np.zeros(size, dtype=dtype)
+        self.counts     = np.zeros(size, dtype=dtype)
+        self.done       = np.zeros(size, dtype=bool)
+        self.interior   = np.zeros(size, dtype=bool)
+        self.iterations = 0
+        self.smooth     = smooth
+
+    def save(self, filename: str):
+        np.savez(filename, zr=self.zr, zi=self.zi, counts=self.counts, done=self.done, interior=self.interior,
+                 iterations=self.iterations, smooth=self.smooth)
+
+    @classmethod
+    def load(cls, filename: str) -> "EscapeTimeState":
+        data = np.load(filename)
+        state = cls(data["zr"].size, data["zr"].dtype, bool(data["smooth"]))
+        state.zr[:], state.zi[:] = data["zr"], data["zi"]
+        state.counts[:], state.done[:] = data["counts"], data["done"]
+        state.interior[:] = data["interior"]
+        state.iterations = int(data["iterations"])
+        return state
+
+
+def pixel_grid(width: int, height: int, x_min: float = -2., x_max: float = 1.,
+               y_min: float = -1.125, y_max: float = 1.125, dtype=np.double):
+    """Parties réelle et imaginaire des points c de chaque pixel, tableaux de forme (width, height)."""
+    x = (x_min + (x_max - x_min)/width*np.arange(width)).astype(dtype)
+    y = (y_min + (y_max - y_min)/height*np.arange(height)).astype(dtype)
+    cr = np.repeat(x[:, np.newaxis], height, axis=1)
+    ci = np.repeat(y[np.newaxis, :], width, axis=0)
+    return cr, ci
 
 
 class MandelbrotSet:
 
-    def __init__(self, max_iterations : int, escape_radius : float = 2. ):
+    def __init__(self, max_iterations : int, escape_radius : float = 2., dtype=np.double,
+                 periodicity_check : bool = False, periodicity_epsilon : float | None = None ):
         self.max_iterations = max_iterations
         self.escape_radius  = escape_radius
+        # np.float32 convient aux zooms peu profonds et divise par deux le trafic mémoire
+        self.dtype          = np.dtype(dtype)
+        # Détection de périodicité : epsilon par défaut adapté à la précision
+        self.periodicity_check   = periodicity_check
+        if periodicity_epsilon is None:
+            periodicity_epsilon = 1.E-10 if self.dtype == np.double else 1.E-5
+        self.periodicity_epsilon = periodicity_epsilon
 
     def __contains__(self, c: complex) -> bool:
         return self.stability(c) == 1
 
-    def convergence(self, c: np.ndarray, smooth=False, clamp=True) -> np.ndarray:
-        value = self.count_iterations(c, smooth)/self.max_iterations
-        return np.maximum(0.0, np.minimum(value, 1.0)) if clamp else value
-
-    def count_iterations(self, c: np.ndarray,  smooth=False) -> np.ndarray:
-        z:    np.ndarray
-        iter: np.ndarray
-
-        # On vérifie dans un premier temps si le complexe
-        # n'appartient pas à une zone de convergence connue :
-        #   1. Appartenance aux disques  C0{(0,0),1/4} et C1{(-1,0),1/4}
-        iter = self.max_iterations * np.ones(c.shape, dtype=np.double)
-        mask = (np.abs(c) >= 0.25) | (np.abs(c+1.) >= 0.25)
-        #  2.  Appartenance à la cardioïde {(1/4,0),1/2(1-cos(theta))}
-        #if (c.real > -0.75) and (c.real < 0.5):
-        #    ct = c.real-0.25 + 1.j * c.imag
-        #    ctnrm2 = abs(ct)
-        #    if ctnrm2 < 0.5*(1-ct.real/max(ctnrm2, 1.E-14)):
-        #        return self.max_iterations
-        # Sinon on itère
-        from scipy import linalg as slinalg
-        z = np.zeros(c.shape, dtype=np.complex128)
-        for it in range(self.max_iterations):
-            z[mask] = z[mask]*z[mask] + c[mask]
-            has_diverged = np.abs(z) > self.escape_radius
-            if has_diverged.size > 0:
-                iter[has_diverged] = np.minimum(iter[has_diverged], it)
-                mask = mask & ~has_diverged
-            if np.any(mask) == False : break
-        has_diverged = np.abs(z) > 2
-        if smooth:
-            iter[has_diverged] += 1 - np.log(np.log(np.abs(z[has_diverged])))/log(2)
-        return iter
-
-# On peut changer les paramètres des deux prochaines lignes
-mandelbrot_set = MandelbrotSet(max_iterations=200, escape_radius=2.)
-width, height = 1024, 1024
-
-scaleX = 3./width
-scaleY = 2.25/height
-convergence = np.empty((width, height), dtype=np.double)
-# Calcul de l'ensemble de mandelbrot :
-deb = time()
-for y in range(height):
-    #for x in range(width):
-    c = np.array([complex(-2. + scaleX*x, -1.125 + scaleY * y) for x in range(width)])
-    convergence[:, y] = mandelbrot_set.convergence(c, smooth=True)
-fin = time()
-print(f"Temps du calcul de l'ensemble de Mandelbrot : {fin-deb}")
-
-# Constitution de l'image résultante :
-deb = time()
-image = Image.fromarray(np.uint8(matplotlib.cm.plasma(convergence.T)*255))
-fin = time()
-print(f"Temps de constitution de l'image : {fin-deb}")
-image.show()
+    def _split(self, c):
+        # c est soit un tableau complexe, soit un couple (cr, ci) de tableaux réels
+        if isinstance(c, tuple):
+            cr, ci = c
+        else:
+            c = np.asarray(c)
+            cr, ci = c.real, c.imag
+        cr = np.ascontiguousarray(cr, dtype=self.dtype)
+        ci = np.ascontiguousarray(ci, dtype=self.dtype)
+        return cr, ci
+
+    def convergence(self, c, smooth=False, clamp=True, out: np.ndarray | None = None,
+                    state: EscapeTimeState | None = None) -> np.ndarray:
+        value = self.count_iterations(c, smooth, out=out, state=state)
+        np.divide(value, self.max_iterations, out=value)
+        return np.clip(value, 0.0, 1.0, out=value) if clamp else value
+
+    def _orbit_start(self, c) -> tuple:
+        # Paramètres (cr, ci) et point de départ (zr0, zi0) des orbites, de la forme de c ;
+        # None pour z0 = c (les sous-classes, comme JuliaSet, changent ce seul choix)
+        cr, ci = self._split(c)
+        return cr, ci, None, None
+
+    def count_iterations(self, c, smooth=False, out: np.ndarray | None = None,
+                         state: EscapeTimeState | None = None) -> np.ndarray:
+        # out doit être un tableau contigu de la forme de c
+        cr, ci, zr0, zi0 = self._orbit_start(c)
+        flat_out = None if out is None else out.reshape(-1)
+        epsilon = self.periodicity_epsilon if self.periodicity_check else None
+        if state is not None and state.iterations > 0 and state.smooth != smooth:
+            raise ValueError("L'état à poursuivre a été calculé avec un autre mode de lissage")
+        if state is not None:
+            state.smooth = smooth
+        iter = escape_time(cr.reshape(-1), ci.reshape(-1), self.max_iterations, self.escape_radius,
+                           smooth, out=flat_out, periodicity_epsilon=epsilon, state=state,
+                           zr0=None if zr0 is None else zr0.reshape(-1),
+                           zi0=None if zi0 is None else zi0.reshape(-1))
+        return iter.reshape(cr.shape) if out is None else out
+
+
+def main():
+    # On peut changer les paramètres des deux prochaines lignes
+    mandelbrot_set = MandelbrotSet(max_iterations=200, escape_radius=2., dtype=np.double)
+    width, height = 1024, 1024
+
+    cr, ci = pixel_grid(width, height, dtype=mandelbrot_set.dtype)
+    convergence = np.empty((width, height), dtype=mandelbrot_set.dtype)
+    # Calcul de l'ensemble de mandelbrot :
+    deb = time()
+    mandelbrot_set.convergence((cr, ci), smooth=True, out=convergence)
+    fin = time()
+    print(f"Temps du calcul de l'ensemble de Mandelbrot : {fin-deb}")
+
+    # Constitution de l'image résultante :
+    deb = time()
+    image = Image.fromarray(colourise(convergence.T, load_lut("plasma")))
+    fin = time()
+    print(f"Temps de constitution de l'image : {fin-deb}")
+    image.show()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# Animation de zoom sur l'ensemble de Mandelbrot avec réutilisation d'une image à l'autre
+#
+# Les images sont calculées à des échelles en progression géométrique autour d'un
+# centre fixe. Un pixel de l'image k+1 dont le point c coïncide avec un point déjà
+# calculé dans l'image k reprend sa valeur ; avec un rapport 1/2, un pixel sur quatre
+# est dans ce cas, et la coïncidence est exacte au bit près (multiplications par 2).
+# En option (comptes entiers seulement), un pixel entouré de quatre échantillons
+# de l'image précédente ayant le même compte reprend ce compte sans être itéré
+# (approximation : une petite fraction des pixels peut alors différer).
+import numpy as np
+from dataclasses import dataclass
+from PIL import Image
+from time import time
+
+from mandelbrot_colour import colourise, load_lut
+from mandelbrot_vec import MandelbrotSet
+
+
+@dataclass
+class FrameStats:
+    frame:    int
+    scale:    float
+    computed: int
+    reused:   int
+    guessed:  int
+    time:     float
+
+
+def frame_grid(center: complex, scale: float, width: int, height: int, dtype=np.double):
+    """Parties réelle et imaginaire (width, height) des pixels, le pixel (width//2, height//2) étant le centre."""
+    x = center.real + scale*(np.arange(width) - width//2)
+    y = center.imag + scale*(np.arange(height) - height//2)
+    cr = np.repeat(x[:, np.newaxis].astype(dtype), height, axis=1)
+    ci = np.repeat(y[np.newaxis, :].astype(dtype), width, axis=0)
+    return cr, ci
+
+
+def zoom_frames(mandelbrot_set: MandelbrotSet, center: complex, scale: float, width: int, height: int,
+                nb_frames: int, ratio: float = 0.5, smooth=False, guess=False):
+    """Générateur des images (width, height) successives et de leurs statistiques de coût.
+
+    L'échelle (taille d'un pixel) est multipliée par ratio < 1 d'une image à l'autre
+    (ValueError sinon : en dézoomant, les pixels sortiraient de l'image précédente).
+    """
+    if not 0 < ratio < 1:
+        raise ValueError(f"Le rapport d'échelle entre deux images doit être dans ]0;1[ (ratio={ratio})")
+    # previous_exact : pixels de l'image précédente calculés (ou repris) exactement,
+    # seuls utilisables comme source de reprise ou comme coins de déduction
+    previous = previous_exact = None
+    for frame in range(nb_frames):
+        deb = time()
+        cr, ci = frame_grid(center, scale, width, height, mandelbrot_set.dtype)
+        counts = np.empty((width, height), dtype=mandelbrot_set.dtype)
+        todo = np.ones((width, height), dtype=bool)
+        reused = guessed = 0
+        guessed_mask = np.zeros((width, height), dtype=bool)
+        if previous is not None:
+            # Position de chaque pixel dans l'image précédente
+            px = width//2 + (np.arange(width) - width//2)*ratio
+            py = height//2 + (np.arange(height) - height//2)*ratio
+            ix, iy = np.rint(px).astype(np.intp), np.rint(py).astype(np.intp)
+            exact_x = np.abs(px - ix) < 1.E-9
+            exact_y = np.abs(py - iy) < 1.E-9
+            exact = exact_x[:, np.newaxis] & exact_y[np.newaxis, :] & previous_exact[np.ix_(ix, iy)]
+            counts[exact] = previous[np.ix_(ix, iy)][exact]
+            todo &= ~exact
+            reused = np.count_nonzero(exact)
+            if guess and not smooth:
+                x0 = np.clip(np.floor(px).astype(np.intp), 0, width - 1)
+                x1 = np.clip(x0 + 1, 0, width - 1)
+                y0 = np.clip(np.floor(py).astype(np.intp), 0, height - 1)
+                y1 = np.clip(y0 + 1, 0, height - 1)
+                corner = previous[np.ix_(x0, y0)]
+                same = (corner == previous[np.ix_(x1, y0)]) & (corner == previous[np.ix_(x0, y1)]) \
+                    & (corner == previous[np.ix_(x1, y1)]) & todo
+                for cx, cy in ((x0, y0), (x1, y0), (x0, y1), (x1, y1)):
+                    same &= previous_exact[np.ix_(cx, cy)]
+                counts[same] = corner[same]
+                todo &= ~same
+                guessed_mask = same
+                guessed = np.count_nonzero(same)
+        counts[todo] = mandelbrot_set.count_iterations((cr[todo], ci[todo]), smooth)
+        previous = counts
+        previous_exact = ~guessed_mask
+        yield counts, FrameStats(frame=frame, scale=scale, computed=int(np.count_nonzero(todo)),
+                                 reused=int(reused), guessed=int(guessed), time=time() - deb)
+        scale *= ratio
+
+
+def main():
+    # On peut changer les paramètres des lignes suivantes
+    mandelbrot_set = MandelbrotSet(max_iterations=500, escape_radius=2.)
+    width, height = 640, 480
+    center = complex(-0.743643887037151, 0.131825904205330)
+
+    frames = []
+    for counts, stats in zoom_frames(mandelbrot_set, center, 3./width, width, height, nb_frames=20, guess=True):
+        print(f"Image {stats.frame} (échelle {stats.scale:.3e}) : {stats.time:.3f} s, "
+              f"{stats.computed} pixels calculés, {stats.reused} réutilisés, {stats.guessed} déduits")
+        frames.append(Image.fromarray(colourise(counts.T, load_lut("plasma"), 0., mandelbrot_set.max_iterations)))
+    frames[0].save("mandelbrot_zoom.gif", save_all=True, append_images=frames[1:], duration=200, loop=0)
+
+
+if __name__ == "__main__":
+    main()